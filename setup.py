@@ -31,5 +31,6 @@ setup(name='Starter',
       main = starter:main
       [console_scripts]
       initialize_starter_db = starter.scripts.initializedb:main
+      build_starter_assets = starter.scripts.buildassets:main
       """,
       )
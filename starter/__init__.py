@@ -1,22 +1,29 @@
 # System imports
-from os import path
-
-# 3rd party imports
-from sqlalchemy import engine_from_config
+from os import path, makedirs
 
 # Pyramid imports
 from pyramid.config import Configurator
+from pyramid.settings import asbool
 from pyramid.authentication import AuthTktAuthenticationPolicy
 from pyramid.authorization import ACLAuthorizationPolicy
 from pyramid.session import SignedCookieSessionFactory
 from pyramid.events import ApplicationCreated, NewRequest, BeforeRender
+from pyramid.tweens import INGRESS
 from pyramid_jinja2 import renderer_factory
 
 # App imports
-from .lib.subscribers import before_renderer, get_current_user
+from .lib.subscribers import before_renderer, get_current_user, user_cache
 from .lib.auth import TokenOrAuthTktAuthenticationPolicy, get_role
 from .lib.settings import SETTINGS
-from .models import DBSession, Base
+from .lib.hashing import hasher
+from .lib.assets import assets
+from .lib.static import static_files
+from .lib.pagecache import page_cache, render_fragment
+from .lib.templating import fragment_cache
+from .lib.warmup import warm_up
+from .lib.renderers import JSONRenderer
+from .lib.replicas import engines_from_config, replicas
+from .models import DBSession, Base, count_cache, document_cache
 from .views import View
 from . import routes
 
@@ -29,9 +36,51 @@ def main(global_config, **settings):
     SETTINGS.update(settings)
 
     # Initialize database session
-    engine = engine_from_config(settings, 'sqlalchemy.')
+    engine, replica_engines = engines_from_config(settings)
     DBSession.configure(bind=engine)
     Base.metadata.bind = engine
+    replicas.configure(replica_engines)
+
+    # Initialize caches
+    user_cache.configure(
+        max_size=int(settings.get('cache.users.max_size', 1000)),
+        ttl=int(settings.get('cache.users.ttl', 300))
+    )
+    count_cache.configure(
+        max_size=int(settings.get('cache.counts.max_size', 1000)),
+        ttl=int(settings.get('cache.counts.ttl', 60)),
+        stale_ttl=int(settings.get('cache.counts.stale_ttl', 300))
+    )
+    document_cache.configure(
+        max_size=int(settings.get('cache.documents.max_size', 1000))
+    )
+    page_cache.configure(
+        max_size=int(settings.get('cache.pages.max_size', 100)),
+        ttl=int(settings.get('cache.pages.ttl', 60))
+    )
+    fragment_cache.configure(
+        max_size=int(settings.get('cache.fragments.max_size', 1000)),
+        ttl=int(settings.get('cache.fragments.ttl', 300))
+    )
+    static_files.configure(
+        max_size=int(settings.get('cache.static.max_size', 100)),
+        max_file_size=int(settings.get('cache.static.max_file_size', 262144))
+    )
+
+    # Initialize password hashing pool
+    hasher.configure(
+        executor=settings.get('hashing.executor', 'process'),
+        max_workers=int(settings.get('hashing.max_workers', 0)) or None,
+        max_pending=int(settings.get('hashing.max_pending', 0)) or None,
+        timeout=float(settings.get('hashing.timeout', 5)),
+        result_timeout=float(settings.get('hashing.result_timeout', 30))
+    )
+
+    # Initialize asset manifest
+    assets.configure(
+        source=settings.get('assets.source', 'starter:static'),
+        directory=settings.get('assets.directory')
+    )
 
     # Initialize session
     session_factory = SignedCookieSessionFactory(
@@ -60,6 +109,10 @@ def main(global_config, **settings):
 
     # config.add_translation_dirs('locale/')
 
+    # Register renderers
+    # .lib.renderers.JSONRenderer (in place of Pyramid's JSON renderer)
+    config.add_renderer('json', JSONRenderer())
+
     # Run injectors/subscribers
     # request.environment -- current env
     config.add_request_method(
@@ -69,14 +122,41 @@ def main(global_config, **settings):
     )
     # request.current_user -- current user (if logged in)
     config.add_request_method(get_current_user, 'current_user', reify=True)
+    # request.fragment -- render a (user specific) template fragment
+    config.add_request_method(render_fragment, 'fragment')
     # .lib.subscribers.before_renderer
     config.add_subscriber(before_renderer, BeforeRender)
+    # .lib.warmup.warm_up
+    config.add_subscriber(warm_up, ApplicationCreated)
+
+    # Initialize the template bytecode cache directory
+    if asbool(settings.get('jinja2.bytecode_caching')) and \
+       settings.get('jinja2.bytecode_caching_directory'):
+        directory = settings['jinja2.bytecode_caching_directory']
+
+        if not path.isdir(directory):
+            makedirs(directory)
 
     # Run package includes
     config.include('pyramid_tm')
     config.include('pyramid_handlers')
     config.include('pyramid_jinja2')
 
+    # Register tweens
+    # Serve cached pages (under pyramid_tm, as shell fragments may need to
+    # load from the database)
+    config.add_tween('starter.lib.pagecache.page_cache_tween_factory',
+                     under='pyramid_tm.tm_tween_factory')
+    # Route reads to read replicas (within the transaction, and around the
+    # page cache, so cached pages' fragments can read from replicas too)
+    config.add_tween('starter.lib.replicas.replica_tween_factory',
+                     under='pyramid_tm.tm_tween_factory',
+                     over='starter.lib.pagecache.page_cache_tween_factory')
+    # Compress responses (over everything else, so the whole response is
+    # compressed at once)
+    config.add_tween('starter.lib.compression.compression_tween_factory',
+                     under=INGRESS)
+
     # Register routes
     config.include(routes)
 
@@ -0,0 +1,197 @@
+"""
+Assets
+------
+
+Fingerprinted, precompressed static assets.
+
+:py:func:`build_assets` (run by the ``build_starter_assets`` script) copies
+every file under ``assets.source`` into ``assets.directory`` with a content
+hash in its name (e.g. ``css/application.3f2a9c1b02de.css``), writes a gzip
+compressed variant (``.gz``) of each text asset, and records the names in a
+``manifest.json``.
+
+Once built, the ``static_url``/``static_path`` Jinja2 filters below point at
+the fingerprinted copies, which :py:func:`asset_view` serves (from
+``/assets/``) with far-future, immutable caching. Assets missing from the
+manifest (or every asset, if it hasn't been built) are served by the regular
+``/static/`` view instead.
+"""
+# System imports
+import os
+import gzip
+import json
+import shutil
+import hashlib
+
+# 3rd party imports
+from jinja2 import contextfilter
+
+# Pyramid imports
+from pyramid.asset import abspath_from_asset_spec
+from pyramid.httpexceptions import HTTPNotFound
+from pyramid.threadlocal import get_current_request
+from pyramid.url import static_url, static_path
+
+# Project imports
+from .static import static_files
+
+
+# File extensions of assets worth compressing
+COMPRESSIBLE = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.html',
+                '.xml')
+
+# Fingerprinted assets never change, so may be cached "forever"
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class AssetManifest(object):
+    """
+    Maps asset specifications (e.g. ``starter:static/css/application.css``)
+    to their fingerprinted copies, as listed in the ``manifest.json`` of a
+    built asset ``directory``.
+
+    ``source``
+        The asset specification of the directory the assets were built from
+        (defaults to ``starter:static``).
+    ``directory``
+        The directory the assets were built into (if not given, or no assets
+        have been built, every lookup misses).
+    """
+    def __init__(self, source='starter:static', directory=None):
+        self.configure(source=source, directory=directory)
+
+    def configure(self, source='starter:static', directory=None):
+        """(Re)configure the manifest, loading it if it's been built."""
+        self.source = source.rstrip('/') + '/'
+        self.directory = directory
+        self.paths = {}
+
+        if directory and os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.paths = json.load(f)
+
+        self.built = set(self.paths.values())
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def lookup(self, spec):
+        """
+        Return the fingerprinted path (relative to ``directory``) of the asset
+        ``spec``, or None if it hasn't been built.
+        """
+        if spec.startswith(self.source):
+            return self.paths.get(spec[len(self.source):])
+
+    def url(self, spec, request, **kw):
+        """Return the URL of the asset ``spec``."""
+        path = self.lookup(spec)
+
+        if path is None:
+            return static_url(spec, request, **kw)
+
+        return request.route_url('assets', subpath=path, **kw)
+
+    def path(self, spec, request, **kw):
+        """Return the (host relative) URL path of the asset ``spec``."""
+        path = self.lookup(spec)
+
+        if path is None:
+            return static_path(spec, request, **kw)
+
+        return request.route_path('assets', subpath=path, **kw)
+
+
+# The application's asset manifest (configured from the ``assets.*`` settings)
+assets = AssetManifest()
+
+
+@contextfilter
+def static_url_filter(ctx, spec, **kw):
+    """
+    Jinja2 filter returning the absolute URL of the asset ``spec``
+    (fingerprinted, if built).
+    """
+    request = ctx.get('request') or get_current_request()
+    return assets.url(spec, request, **kw)
+
+@contextfilter
+def static_path_filter(ctx, spec, **kw):
+    """
+    Jinja2 filter returning the relative URL of the asset ``spec``
+    (fingerprinted, if built).
+    """
+    request = ctx.get('request') or get_current_request()
+    return assets.path(spec, request, **kw)
+
+def asset_view(request):
+    """
+    Serve a fingerprinted asset (from ``/assets/*subpath``), preferring its
+    gzip compressed variant when the client accepts it.
+    """
+    path = '/'.join(request.subpath)
+
+    if path not in assets.built:
+        raise HTTPNotFound(request.url)
+
+    filepath = os.path.join(assets.directory, *request.subpath)
+    response = static_files.negotiate(filepath, request)
+    response.headers['Cache-Control'] = IMMUTABLE
+
+    return response
+
+def build_assets(source, directory):
+    """
+    Copy every file under ``source`` (an asset specification or absolute
+    path) into ``directory`` under a fingerprinted name, gzip compressing the
+    ``COMPRESSIBLE`` ones, and write the ``manifest.json`` mapping the
+    original (relative) paths to the fingerprinted ones. Returns the mapping.
+
+    Previously built copies are left in place, so pages rendered before a
+    deploy can still load their assets.
+    """
+    source = abspath_from_asset_spec(source)
+    paths = {}
+
+    for dirpath, dirnames, filenames in os.walk(source):
+        for filename in sorted(filenames):
+            filepath = os.path.join(dirpath, filename)
+            path = os.path.relpath(filepath, source).replace(os.sep, '/')
+
+            with open(filepath, 'rb') as f:
+                content = f.read()
+
+            # Fingerprint the file name with (part of) its content hash
+            name, ext = os.path.splitext(path)
+            paths[path] = '%s.%s%s' % (
+                name, hashlib.sha1(content).hexdigest()[:12], ext
+            )
+            target = os.path.join(directory, *paths[path].split('/'))
+
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target))
+
+            shutil.copyfile(filepath, target)
+
+            if path.endswith(COMPRESSIBLE):
+                _compress(content, target + '.gz')
+
+    # Write the manifest last (and atomically), so it never lists missing
+    # files
+    manifest_path = os.path.join(directory, 'manifest.json')
+
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(paths, f, indent=2, sort_keys=True)
+
+    os.rename(manifest_path + '.tmp', manifest_path)
+
+    return paths
+
+def _compress(content, target):
+    """Write ``content``, gzip compressed, to ``target``."""
+    with open(target, 'wb') as f:
+        # A fixed mtime keeps builds reproducible
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) \
+                as compressed:
+            compressed.write(content)
@@ -0,0 +1,154 @@
+"""
+Cache
+-----
+"""
+# System imports
+import time
+import threading
+from collections import OrderedDict
+
+
+class Cache(object):
+    """
+    A bounded, thread-safe, in-memory LRU cache with optional expiration.
+
+    ``max_size``
+        The maximum number of entries to hold. Once reached, the least
+        recently used entry is evicted to make room for a new one.
+    ``ttl``
+        The default number of seconds an entry remains valid (``None`` means
+        entries never expire on their own).
+    ``stale_ttl``
+        The number of seconds past ``ttl`` that a :py:meth:`fetch` entry may
+        still be served (stale) while it's recreated in the background.
+
+    Example::
+
+        cache = Cache(max_size=100, ttl=60)
+        cache.set('key', 'value')
+        cache.get('key') # returns 'value'
+        cache.delete_where(lambda key, value: value == 'value')
+        cache.get('key') # returns None
+        cache.fetch('key', lambda: 'value') # returns 'value'
+    """
+    def __init__(self, max_size=1000, ttl=None, stale_ttl=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self._refreshing = set()
+
+    def configure(self, max_size=None, ttl=None, stale_ttl=None):
+        """Update the cache's ``max_size``, default ``ttl`` or ``stale_ttl``."""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl is not None:
+                self.ttl = ttl or None
+            if stale_ttl is not None:
+                self.stale_ttl = stale_ttl
+
+            self._evict()
+
+    def get(self, key, default=None):
+        """Return the value for ``key``, or ``default`` if missing/expired."""
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                return default
+
+            if expires is not None and expires <= time.time():
+                return default
+
+            # Re-insert the entry as the most recently used
+            self._data[key] = (expires, value)
+
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store ``value`` for ``key``, expiring after ``ttl`` seconds (defaults
+        to the cache's ``ttl``).
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else None
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+            self._evict()
+
+    def fetch(self, key, creator):
+        """
+        Return the value for ``key``, calling ``creator()`` to create (and
+        store) it when missing or expired.
+
+        Entries older than ``ttl`` but within ``stale_ttl`` are returned as-is
+        while ``creator()`` is re-run on a background thread, so callers never
+        wait on a refresh ("stale-while-revalidate"). ``creator`` must
+        therefore be safe to call from any thread.
+
+        .. note:: Entries stored via :py:meth:`fetch` should only be read via
+                  :py:meth:`fetch`.
+        """
+        entry = self.get(key)
+
+        if entry is None:
+            return self._create(key, creator)
+
+        created, value = entry
+
+        if self.ttl and created + self.ttl <= time.time():
+            with self._lock:
+                refresh = key not in self._refreshing
+                self._refreshing.add(key)
+
+            if refresh:
+                thread = threading.Thread(target=self._create,
+                                          args=(key, creator))
+                thread.daemon = True
+                thread.start()
+
+        return value
+
+    def _create(self, key, creator):
+        """Create, store and return the :py:meth:`fetch` value for ``key``."""
+        try:
+            value = creator()
+            ttl = self.ttl + self.stale_ttl if self.ttl else None
+            self.set(key, (time.time(), value), ttl=ttl)
+
+            return value
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def delete(self, key):
+        """Remove ``key`` from the cache (if present)."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Remove every entry for which ``predicate(key, value)`` is true."""
+        with self._lock:
+            for key, (expires, value) in list(self._data.items()):
+                if predicate(key, value):
+                    del self._data[key]
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        """Drop least recently used entries until within ``max_size``."""
+        while len(self._data) > max(self.max_size, 0):
+            self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __len__(self):
+        return len(self._data)
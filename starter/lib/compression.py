@@ -0,0 +1,127 @@
+"""
+Compression
+-----------
+
+Response compression (see :py:func:`compression_tween_factory`).
+"""
+# System imports
+import zlib
+
+# Pyramid imports
+from pyramid.response import FileIter
+from pyramid.settings import aslist
+
+# Project imports
+from .static import MmapIter, accepts_gzip
+
+
+# Content types worth compressing (by default)
+CONTENT_TYPES = ('text/html', 'text/css', 'text/plain', 'text/csv',
+                 'application/javascript', 'application/json',
+                 'application/msgpack', 'application/x-ndjson',
+                 'application/xml', 'image/svg+xml')
+
+# Statuses whose responses have no body to compress (or, for 206, whose body
+# is part of another representation)
+BODILESS = (204, 206, 304)
+
+
+def compression_tween_factory(handler, registry):
+    """
+    Tween which gzip compresses responses for clients that accept it.
+
+    Only responses with one of the ``compression.content_types`` (by default
+    ``CONTENT_TYPES``, so already compressed types like images or archives
+    are left alone) which aren't already encoded are compressed. Buffered
+    responses must be at least ``compression.min_size`` bytes (default
+    1024), while streamed responses (i.e. those whose ``app_iter`` isn't a
+    list) are compressed as they're sent. ``compression.level`` sets the zlib
+    compression level (default 6).
+
+    Responses sending a file (e.g. static files, see
+    :py:mod:`starter.lib.static`) are left alone too, rather than reading
+    and compressing the file in Python: serve a precompressed ``.gz``
+    variant of them instead.
+
+    .. note:: Strong ETags of compressed responses are made weak, as the
+              compressed and uncompressed bodies differ.
+    """
+    settings = registry.settings
+    content_types = frozenset(aslist(settings.get('compression.content_types',
+                                                  ' '.join(CONTENT_TYPES))))
+    min_size = int(settings.get('compression.min_size', 1024))
+    level = int(settings.get('compression.level', 6))
+
+    def compression_tween(request):
+        response = handler(request)
+
+        if response.content_type not in content_types or \
+           response.content_encoding or response.status_int in BODILESS or \
+           'no-transform' in response.headers.get('Cache-Control', '') or \
+           _sends_file(request, response.app_iter):
+            return response
+
+        # The response now depends on the request's Accept-Encoding header
+        vary = tuple(response.vary or ())
+
+        if 'Accept-Encoding' not in vary:
+            response.vary = vary + ('Accept-Encoding',)
+
+        if request.method == 'HEAD' or request.range or \
+           not accepts_gzip(request):
+            return response
+
+        if isinstance(response.app_iter, list):
+            body = response.body
+
+            if len(body) < min_size:
+                return response
+
+            compressor = _compressor(level)
+            response.body = compressor.compress(body) + compressor.flush()
+        else:
+            response.app_iter = _compress_iter(response.app_iter, level)
+            response.content_length = None
+
+        response.content_encoding = 'gzip'
+        etag = response.headers.get('ETag')
+
+        if etag and not etag.startswith('W/'):
+            response.headers['ETag'] = 'W/' + etag
+
+        return response
+
+    return compression_tween
+
+def _sends_file(request, app_iter):
+    """
+    Whether ``app_iter`` sends a file (from a memory map, a file iterator or
+    the server's ``wsgi.file_wrapper``).
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+
+    return isinstance(app_iter, (MmapIter, FileIter)) or \
+           (isinstance(file_wrapper, type) and
+            isinstance(app_iter, file_wrapper))
+
+def _compressor(level):
+    """Return a zlib compressor producing gzip formatted output."""
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+def _compress_iter(app_iter, level):
+    """
+    Gzip compress ``app_iter`` chunk by chunk, flushing after each one so the
+    client receives it without waiting for the rest.
+    """
+    compressor = _compressor(level)
+
+    try:
+        for chunk in app_iter:
+            if chunk:
+                yield compressor.compress(chunk) + \
+                      compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        yield compressor.flush()
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
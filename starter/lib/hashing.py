@@ -0,0 +1,199 @@
+"""
+Hashing
+-------
+"""
+# System imports
+import os
+import threading
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                TimeoutError as ResultTimeout)
+from concurrent.futures.process import BrokenProcessPool
+
+# 3rd party imports
+from cryptacular import bcrypt
+
+# Pyramid imports
+from pyramid.path import DottedNameResolver
+
+
+crypt = bcrypt.BCRYPTPasswordManager()
+
+
+# Worker functions (defined at module level so they can be pickled)
+def encode_password(value):
+    """Return the bcrypt hash of ``value``."""
+    return crypt.encode(value)
+
+def check_password(encoded, value):
+    """Return whether ``value`` matches the bcrypt hash ``encoded``."""
+    return crypt.check(encoded, value)
+
+
+class HashingUnavailable(Exception):
+    """
+    Raised when the password hashing pool is saturated, broken, or doesn't
+    return a result in time.
+    """
+
+
+class PasswordHasher(object):
+    """
+    Runs password hashing/verification on a pool of workers, so that request
+    threads aren't pinned by bcrypt's CPU work.
+
+    ``executor``
+        Either ``process`` (default), ``thread``, ``inline`` (no pool), or the
+        dotted name of a callable that accepts ``max_workers`` and returns a
+        :py:class:`concurrent.futures.Executor`.
+    ``max_workers``
+        The number of pool workers (defaults to the number of CPUs).
+    ``max_pending``
+        The maximum number of jobs that may be running or queued at once
+        (defaults to four times ``max_workers``).
+    ``timeout``
+        The number of seconds to wait for a free slot before raising
+        :py:class:`HashingUnavailable` (defaults to 5).
+    ``result_timeout``
+        The number of seconds to wait for each job's result before raising
+        :py:class:`HashingUnavailable` (defaults to 30), so a hung worker
+        can't block the request thread forever.
+
+    A process pool which breaks (e.g. because a worker crashed) is replaced,
+    and the jobs it was running raise :py:class:`HashingUnavailable`.
+    """
+    executors = {
+        'process': ProcessPoolExecutor,
+        'thread': ThreadPoolExecutor,
+    }
+
+    def __init__(self, executor='process', max_workers=None, max_pending=None,
+                 timeout=5, result_timeout=30):
+        self._pool = None
+        self._lock = threading.Lock()
+        self.configure(executor, max_workers, max_pending, timeout,
+                       result_timeout)
+
+    def configure(self, executor='process', max_workers=None, max_pending=None,
+                  timeout=5, result_timeout=30):
+        """(Re)configure the hasher, shutting down any existing pool."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+            if executor in self.executors or executor == 'inline':
+                self.factory = self.executors.get(executor)
+            else:
+                self.factory = DottedNameResolver().maybe_resolve(executor)
+
+            self.max_workers = max_workers or os.cpu_count() or 1
+            self.max_pending = max_pending or self.max_workers * 4
+            self.timeout = timeout
+            self.result_timeout = result_timeout
+            self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def encode(self, value):
+        """Return the bcrypt hash of ``value``."""
+        return self.run(encode_password, value)
+
+    def check(self, encoded, value):
+        """Return whether ``value`` matches the bcrypt hash ``encoded``."""
+        return self.run(check_password, encoded, value)
+
+    def encode_many(self, values):
+        """Return the bcrypt hashes of ``values`` (computed in parallel)."""
+        return self.map(encode_password, values)
+
+    def map(self, fn, values):
+        """
+        Run ``fn(value)`` for each of ``values`` in parallel on the pool, and
+        return the results in order.
+
+        Each job takes up a slot until it completes, so raises
+        :py:class:`HashingUnavailable` if no slot frees up within ``timeout``
+        seconds of the previous job being submitted.
+        """
+        if self.factory is None:
+            return [fn(value) for value in values]
+
+        pool = self._get_pool()
+        futures = []
+
+        try:
+            for value in values:
+                futures.append(self._submit(pool, fn, value))
+
+            return [self._result(pool, future) for future in futures]
+        except:
+            # Don't leave any queued jobs behind
+            for future in futures:
+                future.cancel()
+            raise
+
+    def run(self, fn, *args):
+        """
+        Run ``fn(*args)`` on the pool and return its result.
+
+        Raises :py:class:`HashingUnavailable` if no slot frees up within
+        ``timeout`` seconds.
+        """
+        if self.factory is None:
+            return fn(*args)
+
+        pool = self._get_pool()
+
+        return self._result(pool, self._submit(pool, fn, *args))
+
+    def _submit(self, pool, fn, *args):
+        """
+        Submit ``fn(*args)`` to ``pool`` once a slot is free, returning its
+        future (which holds the slot until it completes).
+        """
+        slots = self._slots
+
+        if not slots.acquire(timeout=self.timeout):
+            raise HashingUnavailable('Password hashing pool is saturated')
+
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            slots.release()
+            self._reset_pool(pool)
+            raise HashingUnavailable('Password hashing pool is broken')
+        except:
+            slots.release()
+            raise
+
+        future.add_done_callback(lambda future: slots.release())
+
+        return future
+
+    def _result(self, pool, future):
+        """Return the result of a ``future`` submitted to ``pool``."""
+        try:
+            return future.result(timeout=self.result_timeout)
+        except ResultTimeout:
+            raise HashingUnavailable('Password hashing timed out')
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            raise HashingUnavailable('Password hashing pool is broken')
+
+    def _get_pool(self):
+        """Lazily start the pool (i.e. after any forking has taken place)."""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = self.factory(max_workers=self.max_workers)
+
+        return self._pool
+
+    def _reset_pool(self, pool):
+        """Discard the (broken) ``pool``, so a new one is started."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+# The app-wide password hasher (see the ``hashing.*`` settings)
+hasher = PasswordHasher()
@@ -0,0 +1,227 @@
+"""
+Packing
+-------
+
+A small pure-Python `MessagePack <http://msgpack.org/>`_ implementation,
+covering the types JSON documents are made of (plus binary data).
+
+If the ``msgpack`` package is installed, :py:func:`unpackb` uses it instead
+(encoding is done by :py:class:`starter.lib.renderers.MsgpackEncoder`, which
+builds on :py:func:`pack_value`).
+"""
+# System imports
+import struct
+
+# 3rd party imports
+try:
+    import msgpack
+except ImportError: # pragma: no cover
+    msgpack = None
+
+
+# MessagePack media types (the first is used for responses)
+MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def packb(value):
+    """Return the MessagePack encoding of ``value``."""
+    if isinstance(value, dict):
+        return pack_map_header(len(value)) + b''.join(
+            packb(key) + packb(item) for key, item in value.items()
+        )
+    elif isinstance(value, (list, tuple)):
+        return pack_array_header(len(value)) + b''.join(packb(item)
+                                                        for item in value)
+
+    return pack_value(value)
+
+def pack_value(value):
+    """
+    Return the MessagePack encoding of the scalar ``value`` (``None``,
+    ``bool``, ``int``, ``float``, ``str`` or ``bytes``).
+    """
+    if value is None:
+        return b'\xc0'
+    elif value is True:
+        return b'\xc3'
+    elif value is False:
+        return b'\xc2'
+    elif isinstance(value, int):
+        return _pack_int(value)
+    elif isinstance(value, float):
+        return b'\xcb' + struct.pack('>d', value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        size = len(data)
+
+        if size < 32:
+            return struct.pack('B', 0xa0 | size) + data
+        elif size < 0x100:
+            return struct.pack('>BB', 0xd9, size) + data
+        elif size < 0x10000:
+            return struct.pack('>BH', 0xda, size) + data
+
+        return struct.pack('>BI', 0xdb, size) + data
+    elif isinstance(value, bytes):
+        size = len(value)
+
+        if size < 0x100:
+            return struct.pack('>BB', 0xc4, size) + value
+        elif size < 0x10000:
+            return struct.pack('>BH', 0xc5, size) + value
+
+        return struct.pack('>BI', 0xc6, size) + value
+
+    raise TypeError('%r is not MessagePack serializable' % value)
+
+def pack_array_header(size):
+    """Return the MessagePack header of an array of ``size`` items."""
+    if size < 16:
+        return struct.pack('B', 0x90 | size)
+    elif size < 0x10000:
+        return struct.pack('>BH', 0xdc, size)
+
+    return struct.pack('>BI', 0xdd, size)
+
+def pack_map_header(size):
+    """Return the MessagePack header of a map of ``size`` items."""
+    if size < 16:
+        return struct.pack('B', 0x80 | size)
+    elif size < 0x10000:
+        return struct.pack('>BH', 0xde, size)
+
+    return struct.pack('>BI', 0xdf, size)
+
+def unpackb(data):
+    """
+    Return the value encoded (as MessagePack) by ``data``, raising
+    ``ValueError`` if it's malformed (or has trailing data).
+    """
+    if msgpack is not None:
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except ValueError:
+            raise
+        except Exception as exc:
+            raise ValueError(str(exc))
+
+    value, offset = _Unpacker(data).unpack(0)
+
+    if offset != len(data):
+        raise ValueError('Extra data after MessagePack value')
+
+    return value
+
+def _pack_int(value):
+    """Return the MessagePack encoding of the integer ``value``."""
+    if 0 <= value < 0x80:
+        return struct.pack('B', value)
+    elif -32 <= value < 0:
+        return struct.pack('b', value)
+    elif value >= 0:
+        for code, fmt, limit in ((0xcc, '>BB', 0x100),
+                                 (0xcd, '>BH', 0x10000),
+                                 (0xce, '>BI', 0x100000000),
+                                 (0xcf, '>BQ', 0x10000000000000000)):
+            if value < limit:
+                return struct.pack(fmt, code, value)
+    else:
+        for code, fmt, limit in ((0xd0, '>Bb', 0x80),
+                                 (0xd1, '>Bh', 0x8000),
+                                 (0xd2, '>Bi', 0x80000000),
+                                 (0xd3, '>Bq', 0x8000000000000000)):
+            if -value <= limit:
+                return struct.pack(fmt, code, value)
+
+    raise TypeError('%r is out of MessagePack range' % value)
+
+
+class _Unpacker(object):
+    """Decodes MessagePack ``data``."""
+    # Fixed size types: code -> (struct format, size)
+    FIXED = {
+        0xca: ('>f', 4), 0xcb: ('>d', 8),
+        0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+        0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+    }
+    # Variable size types: code -> (kind, struct format of the size)
+    SIZED = {
+        0xc4: ('bin', '>B'), 0xc5: ('bin', '>H'), 0xc6: ('bin', '>I'),
+        0xd9: ('str', '>B'), 0xda: ('str', '>H'), 0xdb: ('str', '>I'),
+        0xdc: ('array', '>H'), 0xdd: ('array', '>I'),
+        0xde: ('map', '>H'), 0xdf: ('map', '>I'),
+    }
+    CONSTANTS = {0xc0: None, 0xc2: False, 0xc3: True}
+
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, offset, size):
+        """Return ``size`` bytes from ``offset`` (and the next offset)."""
+        end = offset + size
+
+        if end > len(self.data):
+            raise ValueError('Truncated MessagePack data')
+
+        return self.data[offset:end], end
+
+    def unpack(self, offset):
+        """Return the value at ``offset`` (and the next offset)."""
+        code, offset = self.read(offset, 1)
+        code = ord(code)
+
+        if code < 0x80:
+            return code, offset
+        elif code >= 0xe0:
+            return code - 0x100, offset
+        elif code < 0x90:
+            return self.unpack_items('map', code & 0x0f, offset)
+        elif code < 0xa0:
+            return self.unpack_items('array', code & 0x0f, offset)
+        elif code < 0xc0:
+            return self.unpack_bytes('str', code & 0x1f, offset)
+        elif code in self.CONSTANTS:
+            return self.CONSTANTS[code], offset
+        elif code in self.FIXED:
+            fmt, size = self.FIXED[code]
+            data, offset = self.read(offset, size)
+            return struct.unpack(fmt, data)[0], offset
+        elif code in self.SIZED:
+            kind, fmt = self.SIZED[code]
+            data, offset = self.read(offset, struct.calcsize(fmt))
+            size = struct.unpack(fmt, data)[0]
+
+            if kind in ('map', 'array'):
+                return self.unpack_items(kind, size, offset)
+
+            return self.unpack_bytes(kind, size, offset)
+
+        raise ValueError('Unsupported MessagePack type: 0x%02x' % code)
+
+    def unpack_bytes(self, kind, size, offset):
+        """Return a ``str`` (or ``bin``) value of ``size`` bytes."""
+        data, offset = self.read(offset, size)
+
+        if kind == 'str':
+            try:
+                data = data.decode('utf-8')
+            except UnicodeDecodeError as exc:
+                raise ValueError(str(exc))
+
+        return data, offset
+
+    def unpack_items(self, kind, size, offset):
+        """Return a ``map`` (or ``array``) value of ``size`` items."""
+        items = []
+
+        for i in range(size * 2 if kind == 'map' else size):
+            item, offset = self.unpack(offset)
+            items.append(item)
+
+        if kind == 'array':
+            return items, offset
+
+        try:
+            return dict(zip(items[::2], items[1::2])), offset
+        except TypeError as exc:
+            raise ValueError(str(exc))
@@ -0,0 +1,236 @@
+"""
+Page Cache
+----------
+
+Full-page response caching for anonymous requests, and page "shell" caching
+for everyone else.
+
+Actions opt in with the :py:class:`cache_page` decorator, and
+:py:func:`page_cache_tween_factory` serves (and stores) their rendered
+responses::
+
+    class HandlerClass(object):
+        def __init__(self, request):
+            self.request = request
+
+        @action(renderer='index.jinja2')
+        @cache_page(ttl=300)
+        def index(self):
+            return dict()
+
+Pages which differ per user can still be cached as a shared "shell" by
+rendering the user-specific parts as fragments (templates under
+``starter:templates/fragments/``) via ``request.fragment(name)``::
+
+    {{ request.fragment('user_nav') }}
+
+When a shell is being rendered, each fragment is left as a placeholder which
+is filled in (by rendering just that fragment) whenever the shell is served.
+"""
+# System imports
+import re
+from functools import wraps
+
+# 3rd party imports
+from markupsafe import Markup
+
+# Pyramid imports
+from pyramid.renderers import render
+from pyramid.response import Response
+
+# Project imports
+from .cache import Cache
+
+
+# Rendered page cache, keyed on ``(host, path_qs)`` along with the values of the
+# request headers listed in the cached response's ``Vary`` header (which are
+# themselves stored under the bare ``(host, path_qs)`` key)
+page_cache = Cache(max_size=100, ttl=60)
+
+# Stands in for the (per session) CSRF token within cached pages
+CSRF_PLACEHOLDER = b'__starter_page_cache_csrf_token__'
+
+# Stands in for the fragments of cached page shells
+FRAGMENT_PLACEHOLDER = '<!--fragment:%s-->'
+FRAGMENT_PATTERN = re.compile(br'<!--fragment:([\w/]+)-->')
+
+# Request headers which are handled by ``is_cacheable`` rather than by keying
+IGNORED_VARY = ('authorization', 'cookie')
+
+
+class cache_page(object):
+    """
+    Cache the rendered response of a ``pyramid_handlers`` action for
+    anonymous ``GET`` requests (see :py:func:`page_cache_tween_factory`).
+
+    ``ttl``
+        The number of seconds to cache the response for (defaults to the
+        ``cache.pages.ttl`` setting).
+    ``shell``
+        Whether to cache the response as a shell shared by all users
+        (anonymous or not), with its fragments rendered for each request.
+        Shells are looked up once the action has been authorized, so
+        protected actions may be cached this way too.
+
+        .. warning::
+            Everything specific to the current user (or session) must be
+            rendered via ``request.fragment`` in shell cached pages.
+
+    .. note:: Only ``200 OK`` responses are cached, and any ``Set-Cookie``
+              headers are dropped. A CSRF token rendered into the page is
+              replaced with the requesting session's token when served.
+    """
+    def __init__(self, ttl=None, shell=False):
+        self.ttl = ttl
+        self.shell = shell
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(cls):
+            request = cls.request
+
+            if request.environ.get('starter.warmup'):
+                # Render the whole page, without caching it
+                return fn(cls)
+
+            if self.shell and request.method in ('GET', 'HEAD'):
+                # Serve the shell (if cached) now that we've been authorized
+                base = ('shell', request.host, request.path_qs)
+                entry = _lookup(request, base)
+
+                if entry is not None:
+                    return _response(request, *entry)
+
+            if request.method == 'GET':
+                # Flag the response as cacheable (for the tween)
+                request.environ['starter.cache_page'] = dict(
+                    ttl=self.ttl,
+                    shell=self.shell
+                )
+
+            return fn(cls)
+
+        return wrapper
+
+def is_cacheable(request):
+    """
+    Whether ``request`` may be answered from (or stored in) the page cache,
+    i.e. it's an anonymous ``GET`` (or ``HEAD``) request without any pending
+    flash messages or remembered login email, and isn't a warm-up request
+    (see: :py:func:`starter.lib.warmup.warm_up`).
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    elif request.environ.get('starter.warmup'):
+        return False
+    elif request.unauthenticated_userid or 'email' in request.cookies:
+        return False
+    elif request.cookies and request.session.peek_flash():
+        return False
+
+    return True
+
+def render_fragment(request, name):
+    """
+    Render the ``starter:templates/fragments/<name>.jinja2`` template, or a
+    placeholder for it if a page shell is being rendered.
+
+    Available to templates as ``request.fragment(name)``.
+    """
+    options = request.environ.get('starter.cache_page')
+
+    if options and options['shell']:
+        return Markup(FRAGMENT_PLACEHOLDER % name)
+
+    return Markup(render('starter:templates/fragments/%s.jinja2' % name, {},
+                         request=request))
+
+def page_cache_tween_factory(handler, registry):
+    """
+    Tween which answers cacheable requests from ``page_cache``, storing the
+    responses of actions decorated with :py:class:`cache_page`.
+    """
+    def page_cache_tween(request):
+        cacheable = is_cacheable(request)
+        base = (request.host, request.path_qs)
+
+        if cacheable:
+            entry = _lookup(request, base)
+
+            if entry is not None:
+                return _response(request, *entry)
+
+        response = handler(request)
+        options = request.environ.get('starter.cache_page')
+
+        if options is None or response.status_int != 200:
+            return response
+        elif options['shell']:
+            # Store the shell, then fill it in for this request
+            status, headerlist, body = _store(request, response,
+                                              ('shell',) + base,
+                                              options['ttl'])
+            response.body = _fill(request, body)
+        elif cacheable:
+            _store(request, response, base, options['ttl'])
+
+        return response
+
+    return page_cache_tween
+
+def _lookup(request, base):
+    """Return the cached entry for ``request`` (if any)."""
+    vary = page_cache.get(base)
+
+    if vary is not None:
+        return page_cache.get(_key(request, base, vary))
+
+def _key(request, base, vary):
+    """Return the cache key for ``request``, given its ``Vary`` headers."""
+    return (base, tuple(request.headers.get(name) for name in vary))
+
+def _store(request, response, base, ttl):
+    """Store ``response`` in the page cache, returning the stored entry."""
+    vary = tuple(sorted(name.lower() for name in response.vary or ()
+                        if name.lower() not in IGNORED_VARY))
+    body = response.body
+    headerlist = [(name, value) for name, value in response.headerlist
+                  if name.lower() not in ('set-cookie', 'content-length')]
+
+    if 'session' in request.__dict__:
+        # Punch a hole where the page's CSRF token was rendered (the token
+        # is kept under "_csrft_" by Pyramid's cookie sessions)
+        token = request.session.get('_csrft_')
+
+        if token:
+            body = body.replace(token.encode('utf-8'), CSRF_PLACEHOLDER)
+
+    entry = (response.status, headerlist, body)
+
+    page_cache.set(base, vary, ttl=ttl)
+    page_cache.set(_key(request, base, vary), entry, ttl=ttl)
+
+    return entry
+
+def _response(request, status, headerlist, body):
+    """Build a response to ``request`` from a cached page (or shell)."""
+    response = Response(status=status, headerlist=list(headerlist))
+    response.body = _fill(request, body)
+
+    return response
+
+def _fill(request, body):
+    """Fill in the holes punched in a cached page (or shell) ``body``."""
+    if CSRF_PLACEHOLDER in body:
+        token = request.session.get_csrf_token()
+        body = body.replace(CSRF_PLACEHOLDER, token.encode('utf-8'))
+
+    # Render the fragments themselves from now on
+    request.environ.pop('starter.cache_page', None)
+
+    return FRAGMENT_PATTERN.sub(
+        lambda match: render_fragment(
+            request, match.group(1).decode('utf-8')
+        ).encode('utf-8'),
+        body
+    )
@@ -0,0 +1,151 @@
+"""
+Pagination
+----------
+"""
+# System imports
+import json
+import base64
+import binascii
+from datetime import datetime
+
+# 3rd party imports
+from sqlalchemy import and_, or_
+from sqlalchemy.types import DateTime
+
+# Pyramid imports
+from pyramid.compat import native_
+
+
+def encode_cursor(values):
+    """Encode a list of (JSON serializable) ``values`` as an opaque cursor."""
+    data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+
+    return native_(base64.urlsafe_b64encode(data)).rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode an opaque ``cursor`` back into its list of values.
+
+    Raises :py:class:`ValueError` if the cursor is invalid.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data.decode('utf-8'))
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Invalid cursor: %s' % cursor)
+
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor: %s' % cursor)
+
+    return values
+
+
+class KeysetPage(object):
+    """
+    A "keyset" (a.k.a. "seek" or cursor) page of query results.
+
+    Rather than skipping over ``OFFSET`` rows, each page seeks directly past
+    the last row of the previous page using the sort column (tie-broken by the
+    primary key), so page 5000 costs the same as page 1. No count query is
+    performed.
+
+    ``query``
+        The :py:class:`sqlalchemy.orm.query.Query` to paginate.
+    ``sort_column``
+        The column to sort/seek on.
+    ``key_column``
+        A unique column used to break ties (usually the primary key).
+    ``after``
+        The opaque cursor returned as ``next`` by the previous page (or
+        ``None`` for the first page).
+    ``items_per_page``
+        The maximum number of items to return.
+
+    .. note:: Rows with a ``NULL`` sort value can't be sought past, so the
+              sort column should be non-nullable.
+    """
+    def __init__(self, query, sort_column, key_column, after=None,
+                 items_per_page=20):
+        self.after = after or None
+        self.items_per_page = items_per_page
+
+        if self.after:
+            sort_value, key_value = self._decode(sort_column, key_column,
+                                                 self.after)
+            query = query.filter(or_(
+                sort_column > sort_value,
+                and_(sort_column == sort_value, key_column > key_value)
+            ))
+
+        if sort_column is not key_column:
+            query = query.order_by(sort_column, key_column)
+        else:
+            query = query.order_by(key_column)
+
+        # Fetch an extra row to find out whether there's a next page
+        items = query.limit(items_per_page + 1).all()
+        self.items = items[:items_per_page]
+        self.next = None
+
+        if len(items) > items_per_page:
+            last = self.items[-1]
+            self.next = encode_cursor([
+                self._value(last, sort_column),
+                self._value(last, key_column)
+            ])
+
+    @staticmethod
+    def _value(item, column):
+        """Get the JSON serializable value of ``column`` for ``item``."""
+        value = getattr(item, column.key)
+
+        if isinstance(value, datetime):
+            return value.isoformat()
+
+        return value
+
+    @staticmethod
+    def _check(column, value, cursor):
+        """
+        Check ``value`` is of ``column``'s Python type (or ``None``, if the
+        column is nullable).
+        """
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return
+
+        if value is None and column.nullable:
+            return
+
+        if not isinstance(value, python_type) or \
+           (isinstance(value, bool) and python_type is not bool):
+            raise ValueError('Invalid cursor: %s' % cursor)
+
+    @classmethod
+    def _decode(cls, sort_column, key_column, cursor):
+        """
+        Decode ``cursor`` into its sort and key values.
+
+        Raises :py:class:`ValueError` if the cursor is invalid, or its values
+        aren't of the columns' types.
+        """
+        values = decode_cursor(cursor)
+
+        if len(values) != 2:
+            raise ValueError('Invalid cursor: %s' % cursor)
+
+        sort_value, key_value = values
+
+        if isinstance(sort_column.type, DateTime) and sort_value is not None:
+            try:
+                fmt = '%Y-%m-%dT%H:%M:%S.%f' if '.' in sort_value \
+                                             else '%Y-%m-%dT%H:%M:%S'
+                sort_value = datetime.strptime(sort_value, fmt)
+            except TypeError:
+                raise ValueError('Invalid cursor: %s' % cursor)
+
+        cls._check(sort_column, sort_value, cursor)
+        cls._check(key_column, key_value, cursor)
+
+        return sort_value, key_value
@@ -0,0 +1,334 @@
+"""
+Renderers
+---------
+
+A faster drop-in replacement for Pyramid's ``json`` renderer, which also
+speaks MessagePack (see :py:class:`JSONRenderer`).
+"""
+# System imports
+from datetime import date, datetime, timezone
+from json.encoder import encode_basestring_ascii
+
+# 3rd party imports
+from marshmallow import fields as schema_fields
+
+# Project imports
+from .cache import Cache
+from .packing import (MEDIA_TYPES as MSGPACK_TYPES, pack_value,
+                      pack_array_header, pack_map_header)
+from ..models import ModelMixin
+
+
+# Compiled model encoding plans, keyed on ``(encoder, model, fields, include)``
+plan_cache = Cache(max_size=256)
+
+
+class JSONRenderer(object):
+    """
+    Renderer factory producing the same JSON documents as Pyramid's default
+    ``json`` renderer, only faster (and without whitespace). Registered in
+    its place, so views keep using ``renderer='json'``.
+
+    Model objects (e.g. the ``User`` objects of a page of results) are
+    encoded straight from their attributes with a plan compiled from their
+    ``ModelNameJSON`` schema (for the request's ``fields``/``include``
+    params): each field's key is encoded once up front, and its value is
+    encoded according to the field's type (e.g. datetimes are formatted
+    without going through marshmallow). Other values are encoded like
+    :py:func:`json.dumps` would (datetimes and objects with a ``__json__``
+    method included).
+
+    Requests preferring ``application/msgpack`` (see :py:func:`media_type`)
+    are answered with the same document encoded as MessagePack instead.
+    """
+    def __call__(self, info):
+        def _render(value, system):
+            request = system.get('request')
+            content_type = media_type(request)
+
+            if request is not None:
+                response = request.response
+
+                if response.content_type == response.default_content_type:
+                    response.content_type = content_type
+
+            if content_type in MSGPACK_TYPES:
+                return MsgpackEncoder(request).encode(value)
+
+            return encode_json(value, request)
+
+        return _render
+
+
+def media_type(request):
+    """
+    Return the media type to render documents for ``request`` as:
+    ``application/msgpack`` if its ``Accept`` header prefers MessagePack to
+    JSON, otherwise ``application/json``.
+    """
+    # (Requests may not have one, e.g. ``pyramid.testing.DummyRequest``)
+    accept = getattr(request, 'accept', None)
+
+    if accept is not None:
+        match = accept.best_match(('application/json',) + MSGPACK_TYPES)
+
+        if match in MSGPACK_TYPES:
+            return MSGPACK_TYPES[0]
+
+    return 'application/json'
+
+def encode_json(value, request=None):
+    """
+    Return the (compact) JSON encoding of ``value``, serializing any models
+    in it for ``request`` (see :py:class:`JSONRenderer`).
+    """
+    return JSONEncoder(request).encode(value)
+
+def format_datetime(value):
+    """
+    Format ``value`` as an ISO 8601 UTC date/time (treating naive values as
+    UTC), as marshmallow's ``DateTime`` field does.
+    """
+    if value.tzinfo is None:
+        return value.isoformat() + '+00:00'
+
+    return value.astimezone(timezone.utc).isoformat()
+
+
+class ModelEncoder(object):
+    """
+    Base class for encoders of values for a ``request`` (whose
+    ``fields``/``include`` params select the model fields to encode).
+
+    Subclasses define the ``encoders`` of each value type, the
+    ``field_encoders`` of each schema field type, and how to encode
+    containers, models and keys.
+
+    Each encoder looks up a model's plan (see: :py:meth:`plan`) once, so a
+    page of models costs one ``plan_cache`` lookup rather than one per row.
+    """
+    encoders = {}
+    field_encoders = ()
+
+    def __init__(self, request=None):
+        self.request = request
+        self.fields = request.GET.get('fields', '') if request else ''
+        self.include = request.GET.get('include', '') if request else ''
+        self.plans = {}
+
+    def encode(self, value):
+        """Return the encoding of ``value``."""
+        encode = self.encoders.get(type(value))
+
+        if encode is not None:
+            return encode(value)
+        elif isinstance(value, dict):
+            return self.encode_dict(value)
+        elif isinstance(value, (list, tuple)):
+            return self.encode_list(value)
+        elif isinstance(value, ModelMixin):
+            return self.encode_model(value)
+        elif hasattr(value, '__json__'):
+            return self.encode(value.__json__(self.request))
+
+        for type_, encode in self.encoders.items():
+            if isinstance(value, type_):
+                return encode(value)
+
+        raise TypeError('%r is not serializable' % value)
+
+    def encode_dict(self, value):
+        raise NotImplementedError
+
+    def encode_list(self, value):
+        raise NotImplementedError
+
+    def encode_model(self, obj):
+        raise NotImplementedError
+
+    def fragment(self, name, index):
+        """Return the encoding of the ``index``-th field's key, ``name``."""
+        raise NotImplementedError
+
+    def encode_fields(self, obj, plan):
+        """Return the encoded keys and values of ``obj``'s ``plan`` fields."""
+        parts = []
+
+        for fragment, attribute, encode in plan:
+            value = getattr(obj, attribute)
+            parts.append(fragment)
+
+            if encode is None:
+                parts.append(self.encode(value))
+            elif value is None:
+                parts.append(self.encoders[type(None)](value))
+            else:
+                parts.append(encode(value))
+
+        return parts
+
+    def plan(self, model):
+        """
+        Return the encoding plan of ``model`` for this encoder's
+        ``fields``/``include``: a list of ``(key fragment, attribute,
+        encoder)`` tuples (where an encoder of None means the value is encoded
+        generically), or None if the model has no JSON schema.
+        """
+        plan = self.plans.get(model, False)
+
+        if plan is not False:
+            return plan
+
+        key = (self.__class__, model, self.fields, self.include)
+        plan = plan_cache.get(key, False)
+
+        if plan is False:
+            plan = self._compile_plan(model.json_serializer(self.fields,
+                                                            self.include))
+            plan_cache.set(key, plan)
+
+        self.plans[model] = plan
+
+        return plan
+
+    def _compile_plan(self, serializer):
+        """Build an encoding plan for ``serializer`` (see: ``plan``)."""
+        if not serializer:
+            return None
+
+        plan = []
+
+        for name in serializer.opts.fields:
+            field = serializer.fields[name]
+            encode = None
+
+            for type_, encoder in self.field_encoders:
+                if isinstance(field, type_):
+                    encode = encoder
+                    break
+
+            plan.append((self.fragment(name, len(plan)),
+                         field.attribute or name, encode))
+
+        return plan
+
+
+class JSONEncoder(ModelEncoder):
+    """Encodes values as (compact) JSON text."""
+    def encode_dict(self, value):
+        return '{%s}' % ','.join(encode_basestring_ascii(_key(key)) + ':' +
+                                 self.encode(item)
+                                 for key, item in value.items())
+
+    def encode_list(self, value):
+        return '[%s]' % ','.join(self.encode(item) for item in value)
+
+    def encode_model(self, obj):
+        """
+        Return the encoding of the model ``obj`` (as its ``__json__`` method
+        would serialize it).
+        """
+        plan = self.plan(obj.__class__)
+
+        if plan is None:
+            return 'null'
+        elif not plan:
+            return '{}'
+
+        return ''.join(self.encode_fields(obj, plan)) + '}'
+
+    def fragment(self, name, index):
+        return (',' if index else '{') + encode_basestring_ascii(name) + ':'
+
+
+class MsgpackEncoder(ModelEncoder):
+    """Encodes values as MessagePack bytes."""
+    def encode_dict(self, value):
+        return pack_map_header(len(value)) + b''.join(
+            self.encode(_key(key)) + self.encode(item)
+            for key, item in value.items()
+        )
+
+    def encode_list(self, value):
+        return pack_array_header(len(value)) + b''.join(self.encode(item)
+                                                        for item in value)
+
+    def encode_model(self, obj):
+        """
+        Return the encoding of the model ``obj`` (as its ``__json__`` method
+        would serialize it).
+        """
+        plan = self.plan(obj.__class__)
+
+        if plan is None:
+            return pack_value(None)
+
+        return pack_map_header(len(plan)) + \
+               b''.join(self.encode_fields(obj, plan))
+
+    def fragment(self, name, index):
+        return pack_value(name)
+
+
+def _key(key):
+    """Coerce the dict ``key`` to a string, as :py:func:`json.dumps` does."""
+    if isinstance(key, str):
+        return key
+    elif key is True or key is False or key is None:
+        return JSONEncoder.encoders[type(key)](key)
+    elif isinstance(key, (int, float)):
+        return JSONEncoder.encoders[float if isinstance(key, float) else int](
+            key
+        )
+
+    raise TypeError('key %r is not a string' % key)
+
+def _encode_float(value):
+    """Encode ``value`` as :py:func:`json.dumps` does."""
+    if value != value:
+        return 'NaN'
+    elif value == float('inf'):
+        return 'Infinity'
+    elif value == -float('inf'):
+        return '-Infinity'
+
+    return float.__repr__(value)
+
+
+# Encoders of (exactly) these value types
+JSONEncoder.encoders = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    float: _encode_float,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+    datetime: lambda value: '"%s"' % format_datetime(value),
+    date: lambda value: '"%s"' % value.isoformat(),
+}
+MsgpackEncoder.encoders = {
+    str: pack_value,
+    bytes: pack_value,
+    int: pack_value,
+    float: pack_value,
+    bool: pack_value,
+    type(None): pack_value,
+    datetime: lambda value: pack_value(format_datetime(value)),
+    date: lambda value: pack_value(value.isoformat()),
+}
+
+# Encoders of the (non null) values of these schema field types (checked in
+# order)
+JSONEncoder.field_encoders = (
+    (schema_fields.Boolean, JSONEncoder.encoders[bool]),
+    (schema_fields.DateTime, JSONEncoder.encoders[datetime]),
+    (schema_fields.Integer, lambda value: int.__repr__(int(value))),
+    (schema_fields.Float, lambda value: _encode_float(float(value))),
+    (schema_fields.String, lambda value: encode_basestring_ascii(str(value))),
+)
+MsgpackEncoder.field_encoders = (
+    (schema_fields.Boolean, lambda value: pack_value(bool(value))),
+    (schema_fields.DateTime, MsgpackEncoder.encoders[datetime]),
+    (schema_fields.Integer, lambda value: pack_value(int(value))),
+    (schema_fields.Float, lambda value: pack_value(float(value))),
+    (schema_fields.String, lambda value: pack_value(str(value))),
+)
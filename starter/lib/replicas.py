@@ -0,0 +1,107 @@
+"""
+Read Replicas
+-------------
+
+Routing of read-only database work to read replicas.
+
+Replicas are configured alongside the primary database, each by a set of
+``sqlalchemy.replicas.<name>.*`` settings (see :py:func:`engines_from_config`)::
+
+    sqlalchemy.url = postgresql://primary/starter
+    sqlalchemy.replicas.a.url = postgresql://replica-a/starter
+    sqlalchemy.replicas.b.url = postgresql://replica-b/starter
+
+:py:func:`replica_tween_factory` picks a replica for each request, which
+``DBSession`` (a :py:class:`~starter.models.RoutingSession`) sends reads to
+once they're enabled, e.g. for ``GET`` requests to the API (user identities
+are always loaded from the primary, as they're cached). Writes, and anything
+after a write in the same request, go to the primary (as do all reads by
+clients which wrote within the last ``replicas.sticky`` seconds, so they can
+read their writes despite any replication lag).
+"""
+# System imports
+import random
+
+# 3rd party imports
+from sqlalchemy import engine_from_config
+
+# Project imports
+from ..models import DBSession
+
+
+class Replicas(object):
+    """The read replica engines to route reads to."""
+    def __init__(self, engines=()):
+        self.configure(engines)
+
+    def configure(self, engines=()):
+        self.engines = list(engines)
+
+    def choose(self):
+        """Return a (random) replica engine, or None if there are none."""
+        if self.engines:
+            return random.choice(self.engines)
+
+
+# Initialize the replica engines (see: ``starter.main``)
+replicas = Replicas()
+
+
+def engines_from_config(settings, prefix='sqlalchemy.'):
+    """
+    Return the primary engine configured by the ``sqlalchemy.*`` settings,
+    along with a list of the replica engines configured by each set of
+    ``sqlalchemy.replicas.<name>.*`` settings (which must include a ``url``).
+    """
+    replica_prefix = prefix + 'replicas.'
+    primary = engine_from_config(dict(
+        (key, value) for key, value in settings.items()
+        if not key.startswith(replica_prefix)
+    ), prefix)
+    names = sorted(set(key[len(replica_prefix):-len('.url')]
+                       for key in settings
+                       if key.startswith(replica_prefix) and
+                          key.endswith('.url')))
+
+    return primary, [engine_from_config(settings,
+                                        '%s%s.' % (replica_prefix, name))
+                     for name in names]
+
+def replica_tween_factory(handler, registry):
+    """
+    Tween which routes each request's reads (once enabled) to a replica.
+
+    Requests which write to the primary (including changes still pending in
+    the session, which are flushed when the transaction commits) set a cookie
+    (``replicas.cookie_name``, by default ``starter-primary``) which keeps
+    that client's reads on the primary for ``replicas.sticky`` seconds
+    (default 10, which should exceed the replicas' usual lag).
+    """
+    settings = registry.settings
+    cookie_name = settings.get('replicas.cookie_name', 'starter-primary')
+    sticky = int(settings.get('replicas.sticky', 10))
+
+    def replica_tween(request):
+        if not replicas.engines:
+            return handler(request)
+
+        session = DBSession()
+
+        if cookie_name in request.cookies:
+            session.route()
+        else:
+            session.route(replicas.choose())
+
+        try:
+            response = handler(request)
+
+            if session.pinned or session.new or session.dirty or \
+               session.deleted:
+                response.set_cookie(cookie_name, '1', max_age=sticky,
+                                    httponly=True)
+
+            return response
+        finally:
+            session.route()
+
+    return replica_tween
@@ -0,0 +1,244 @@
+"""
+Static Files
+------------
+
+Static file serving which avoids copying file contents through Python where
+possible.
+
+Small (hot) files are memory mapped once and then served from the mapping
+(until they change on disk), while larger files are handed to the server's
+``wsgi.file_wrapper`` (which servers like waitress and gunicorn send with
+``sendfile`` or similar). ``Range``, ``If-Modified-Since`` and
+``If-None-Match`` requests are answered without reading the rest of the file.
+"""
+# System imports
+import os
+import mmap
+import mimetypes
+
+# Pyramid imports
+from pyramid.asset import abspath_from_asset_spec
+from pyramid.httpexceptions import HTTPNotFound
+from pyramid.response import Response, FileIter
+
+# Project imports
+from .cache import Cache
+
+
+# The number of bytes per ``app_iter`` chunk
+BLOCK_SIZE = 256 * 1024
+
+
+class StaticFiles(object):
+    """
+    Builds conditional (``Range``/``If-Modified-Since``/``If-None-Match``
+    aware) responses for files on disk.
+
+    ``max_size``
+        The maximum number of files to keep memory mapped.
+    ``max_file_size``
+        The size (in bytes) of the largest file to memory map. Larger files
+        are streamed with the server's ``wsgi.file_wrapper`` (if any).
+    """
+    def __init__(self, max_size=100, max_file_size=256 * 1024):
+        self.cache = Cache(max_size=max_size)
+        self.max_file_size = max_file_size
+
+    def configure(self, max_size=None, max_file_size=None):
+        """Update the ``max_size`` or ``max_file_size``."""
+        if max_size is not None:
+            self.cache.configure(max_size=max_size)
+        if max_file_size is not None:
+            self.max_file_size = max_file_size
+            self.cache.clear()
+
+    def response(self, path, request, cache_max_age=None, content_type=None,
+                 content_encoding=None):
+        """
+        Return a response serving the file at ``path`` (which must exist)
+        to ``request``.
+        """
+        stat = os.stat(path)
+
+        if content_type is None:
+            content_type, content_encoding = mimetypes.guess_type(path,
+                                                                  strict=False)
+
+        response = Response(
+            content_type=str(content_type or 'application/octet-stream'),
+            content_encoding=content_encoding,
+            conditional_response=True
+        )
+        response.last_modified = stat.st_mtime
+        response.etag = '%x-%x' % (int(stat.st_mtime), stat.st_size)
+
+        if 0 < stat.st_size <= self.max_file_size:
+            response.app_iter = MmapIter(self._map(path, stat))
+        else:
+            file = open(path, 'rb')
+            file_wrapper = request.environ.get('wsgi.file_wrapper')
+
+            # File wrappers can't serve part of a file (which would otherwise
+            # be read through and sliced)
+            if file_wrapper is not None and not request.range:
+                response.app_iter = file_wrapper(file, BLOCK_SIZE)
+            else:
+                response.app_iter = RangeFileIter(file, BLOCK_SIZE)
+
+        # Assignment of content_length must come after assignment of app_iter
+        response.content_length = stat.st_size
+
+        if cache_max_age is not None:
+            response.cache_expires = cache_max_age
+
+        return response
+
+    def negotiate(self, path, request, cache_max_age=None, content_type=None):
+        """
+        Return a response serving the file at ``path`` (which must exist), or
+        its precompressed variant (``path + '.gz'``, if there is one) when the
+        client accepts gzip.
+        """
+        compressed = path + '.gz'
+
+        if not os.path.isfile(compressed):
+            return self.response(path, request, cache_max_age, content_type)
+
+        if content_type is None:
+            content_type = mimetypes.guess_type(path, strict=False)[0]
+
+        if accepts_gzip(request):
+            response = self.response(compressed, request, cache_max_age,
+                                     content_type, 'gzip')
+        else:
+            response = self.response(path, request, cache_max_age,
+                                     content_type)
+
+        response.vary = ('Accept-Encoding',)
+
+        return response
+
+    def _map(self, path, stat):
+        """
+        Return a (cached) read-only memory map of the file at ``path``,
+        remapping it if it's changed since it was cached.
+        """
+        version = (stat.st_ino, stat.st_mtime, stat.st_size)
+        entry = self.cache.get(path)
+
+        if entry is None or entry[0] != version:
+            with open(path, 'rb') as file:
+                entry = (version, mmap.mmap(file.fileno(), 0,
+                                            access=mmap.ACCESS_READ))
+
+            self.cache.set(path, entry)
+
+        return entry[1]
+
+
+def accepts_gzip(request):
+    """
+    Whether the client accepts gzip compressed responses (clients sending no
+    ``Accept-Encoding`` header are assumed not to).
+    """
+    return 'Accept-Encoding' in request.headers and \
+           'gzip' in request.accept_encoding
+
+
+# The application's static file server (configured from the ``cache.static.*``
+# settings)
+static_files = StaticFiles()
+
+
+class MmapIter(object):
+    """
+    A WSGI ``app_iter`` serving the ``start:stop`` range of a memory map in
+    ``block_size`` chunks.
+    """
+    def __init__(self, map, start=0, stop=None, block_size=BLOCK_SIZE):
+        self.map = map
+        self.position = start
+        self.stop = len(map) if stop is None else min(stop, len(map))
+        self.block_size = block_size
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.position >= self.stop:
+            raise StopIteration
+
+        end = min(self.position + self.block_size, self.stop)
+        value = self.map[self.position:end]
+        self.position = end
+
+        return value
+
+    __next__ = next # py3
+
+    def app_iter_range(self, start, stop):
+        """Return an ``app_iter`` serving just the ``start:stop`` range."""
+        return MmapIter(self.map, start, stop, self.block_size)
+
+
+class RangeFileIter(FileIter):
+    """
+    A :py:class:`pyramid.response.FileIter` which can serve part of its file
+    (by seeking to it, rather than reading up to it).
+    """
+    def __init__(self, file, block_size=BLOCK_SIZE, stop=None):
+        super(RangeFileIter, self).__init__(file, block_size)
+        self.remaining = None if stop is None else stop - file.tell()
+
+    def next(self):
+        size = self.block_size
+
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+
+            if size <= 0:
+                raise StopIteration
+
+        value = self.file.read(size)
+
+        if not value:
+            raise StopIteration
+
+        if self.remaining is not None:
+            self.remaining -= len(value)
+
+        return value
+
+    __next__ = next # py3
+
+    def app_iter_range(self, start, stop):
+        """Return an ``app_iter`` serving just the ``start:stop`` range."""
+        self.file.seek(start)
+        return RangeFileIter(self.file, self.block_size, stop)
+
+
+class StaticView(object):
+    """
+    A view serving the files under ``root_dir`` (an asset specification or
+    absolute path) with :py:data:`static_files`, in place of
+    :py:class:`pyramid.static.static_view` (on a route with a ``*subpath``).
+
+    Files with a precompressed ``.gz`` variant alongside them are served
+    compressed to clients which accept it (see
+    :py:meth:`StaticFiles.negotiate`).
+    """
+    def __init__(self, root_dir, cache_max_age=3600):
+        self.root_dir = os.path.normpath(abspath_from_asset_spec(root_dir))
+        self.cache_max_age = cache_max_age
+
+    def __call__(self, context, request):
+        if any(part in ('', '.', '..') or '/' in part or os.sep in part
+               for part in request.subpath):
+            raise HTTPNotFound('Out of bounds: %s' % request.url)
+
+        path = os.path.join(self.root_dir, *request.subpath)
+
+        if not os.path.isfile(path):
+            raise HTTPNotFound(request.url)
+
+        return static_files.negotiate(path, request, self.cache_max_age)
@@ -0,0 +1,89 @@
+"""
+Streaming
+---------
+"""
+# 3rd party imports
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+# Pyramid imports
+from pyramid.response import Response
+
+# Project imports
+from .renderers import JSONEncoder
+from ..models import DBSession
+
+
+def stream_json(request, model, ndjson=False, batch_size=500):
+    """
+    Return a :py:class:`pyramid.response.Response` which streams every
+    ``model`` row (ordered by primary key) as a chunked JSON array, or as
+    newline delimited JSON (NDJSON) if ``ndjson`` is true.
+
+    Rows are fetched ``batch_size`` at a time (via
+    :py:meth:`sqlalchemy.orm.query.Query.yield_per`) and encoded as the
+    ``json`` renderer would (see
+    :py:class:`~starter.lib.renderers.JSONEncoder`), so memory use stays flat
+    regardless of the number of rows.
+
+    .. note:: The rows are read by a dedicated session as the response body is
+              sent (i.e. after the request's transaction has ended), so only
+              committed data is streamed.
+    """
+    # Resolve the bind and loader options now, as the query only runs once the
+    # response is iterated
+    bind = DBSession.get_bind(model)
+    options = model.json_loader_options(request.GET.get('fields', ''),
+                                        request.GET.get('include', ''),
+                                        collections=False)
+
+    encoder = JSONEncoder(request)
+
+    def encode(objs):
+        """Encode a batch of ``objs`` as a list of JSON strings."""
+        return [encoder.encode(obj) for obj in objs]
+
+    def app_iter():
+        session = Session(bind=bind)
+        separator = '\n' if ndjson else ','
+        batch, started = [], False
+
+        try:
+            query = session.query(model) \
+                           .options(*options) \
+                           .order_by(*inspect(model).primary_key) \
+                           .yield_per(batch_size)
+
+            if not ndjson:
+                yield b'['
+
+            for obj in query:
+                batch.append(obj)
+
+                if len(batch) >= batch_size:
+                    chunk = separator.join(encode(batch))
+                    yield ((separator if started else '') + chunk) \
+                        .encode('utf-8')
+                    batch, started = [], True
+
+            if batch:
+                chunk = separator.join(encode(batch))
+                yield ((separator if started else '') + chunk).encode('utf-8')
+                started = True
+
+            if not ndjson:
+                yield b']'
+            elif started:
+                yield b'\n'
+        finally:
+            session.close()
+
+    response = Response(
+        content_type='application/x-ndjson' if ndjson else 'application/json',
+        charset='utf-8',
+        app_iter=app_iter()
+    )
+    # This is a publicly accessible API
+    response.headers.update({'Access-Control-Allow-Origin': '*'})
+
+    return response
@@ -6,30 +6,215 @@ Subscribers
 import logging
 import subprocess
 from os import path
+from itertools import chain
+
+# 3rd party imports
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (BinaryExpression, BindParameter,
+                                     BooleanClauseList, Grouping)
 
 # App imports
 from . import helpers
 from .auth import get_token_credentials
-from ..models import User
+from .cache import Cache
+from ..models import DBSession, User, UserProfile, document_cache
+
+
+# Authenticated user identity cache, keyed on ``(userid, token)``
+user_cache = Cache(max_size=1000, ttl=300)
 
 def before_renderer(event):
     """Perform renderer globals injection."""
     event['h'] = helpers
 
 def get_current_user(request):
-    """Get the current user object."""
+    """
+    Get the current user object.
+
+    Identified users are held (detached from any session) in ``user_cache``
+    so that subsequent requests by the same user don't need to query the
+    database. Cached users are merged into the current ``DBSession`` without
+    being reloaded.
+
+    Uncached users are always loaded from the primary database (rather than
+    a possibly lagging read replica), and aren't cached if any cached users
+    were invalidated while they were being loaded (see:
+    :py:func:`invalidate_user_cache`), so a demoted role or revoked API token
+    isn't cached again.
+    """
     userid = request.unauthenticated_userid
 
-    if userid:
-        if request.headers.get('Authorization'):
-            # We're using Token Authentication
-            credentials = get_token_credentials(request)
+    if not userid:
+        return None
+
+    if request.headers.get('Authorization'):
+        # We're using Token Authentication
+        credentials = get_token_credentials(request)
+
+        if not credentials:
+            return None
+
+        key = (userid.lower(), credentials['token'])
+        filters = (User.email == userid,
+                   User.api_token == credentials['token'])
+    else:
+        # We're using AuthTkt Authentication
+        key = (userid.lower(), None)
+        filters = (User.email == userid,)
+
+    # Check the identity cache first
+    cached_user = user_cache.get(key)
+
+    if cached_user is not None:
+        return DBSession.merge(cached_user, load=False)
+
+    generation = _invalidations['generation']
+
+    with DBSession().reading_from_replica(False):
+        user = User.first(*filters)
+
+    if user is not None and user not in DBSession.dirty and \
+       generation == _invalidations['generation']:
+        user_cache.set(key, _detached_copy(user))
+
+    return user
+
+def _detached_copy(obj):
+    """
+    Return a detached copy of ``obj`` holding its loaded column values (so it
+    can be safely shared between threads/sessions).
+    """
+    state = inspect(obj)
+    copy = state.manager.new_instance()
+
+    for attr in state.mapper.column_attrs:
+        if attr.key in state.dict:
+            set_committed_value(copy, attr.key, state.dict[attr.key])
+
+    make_transient_to_detached(copy)
 
-            if credentials:
-                return User.first(User.email == userid,
-                                  User.api_token == credentials['token'])
+    return copy
+
+
+# Counts cached user invalidations (see: ``get_current_user``)
+_invalidations = dict(generation=0)
+
+def _invalidate_users(ids=None):
+    """
+    Remove the cached users (and their encoded JSON documents) whose id is
+    in ``ids``, or every cached user if ``ids`` is None.
+    """
+    _invalidations['generation'] += 1
+
+    if ids is None:
+        user_cache.clear()
+        document_cache.delete_where(
+            lambda key, document: key[0] == User.__name__
+        )
+    else:
+        user_cache.delete_where(lambda key, user: user.id in ids)
+        document_cache.delete_where(
+            lambda key, document: key[0] == User.__name__ and key[1] in ids
+        )
+
+def _pending_invalidation(session, ids=None):
+    """
+    Invalidate the cached users whose id is in ``ids`` (or every cached user)
+    now, and again once ``session`` commits (see: ``invalidate_after_commit``)
+    as other requests may cache the old rows until then.
+    """
+    _invalidate_users(ids)
+    pending = session.info.get('starter.invalidated_users', set())
+
+    if ids is None or pending is None:
+        session.info['starter.invalidated_users'] = None
+    else:
+        session.info['starter.invalidated_users'] = pending | ids
+
+@event.listens_for(DBSession, 'after_flush')
+def invalidate_user_cache(session, flush_context):
+    """
+    Remove cached users (and their encoded JSON documents) whose
+    ``User``/``UserProfile`` rows were flushed.
+    """
+    ids = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, User):
+            ids.add(obj.id)
+        elif isinstance(obj, UserProfile):
+            ids.add(obj.user_id)
+
+    if ids:
+        _pending_invalidation(session, ids)
+
+@event.listens_for(DBSession, 'after_bulk_update')
+@event.listens_for(DBSession, 'after_bulk_delete')
+def clear_user_cache(context):
+    """
+    Remove cached users (and their encoded JSON documents) after bulk
+    ``User``/``UserProfile`` statements: those whose id the statement is
+    restricted to (by ``User.id``/``UserProfile.user_id`` criteria), or every
+    cached user if it isn't.
+    """
+    entities = [desc['type'] for desc in context.query.column_descriptions]
+
+    if User in entities:
+        column = User.__table__.c.id
+    elif UserProfile in entities:
+        column = UserProfile.__table__.c.user_id
+    else:
+        return
+
+    _pending_invalidation(context.session,
+                          _criterion_ids(context.query.whereclause, column))
+
+def _criterion_ids(criterion, column):
+    """
+    Return the set of ``column`` values a ``criterion`` (e.g.
+    ``column == 1``, ``column.in_([1, 2])``, or either combined with others
+    by ``and_``) restricts rows to, or None if it doesn't.
+    """
+    if isinstance(criterion, BooleanClauseList) and \
+       criterion.operator is operators.and_:
+        for clause in criterion.clauses:
+            ids = _criterion_ids(clause, column)
+
+            if ids is not None:
+                return ids
+    elif isinstance(criterion, BinaryExpression) and \
+         column in criterion.left.proxy_set:
+        if criterion.operator is operators.eq:
+            params = [criterion.right]
+        elif criterion.operator is operators.in_op and \
+             isinstance(criterion.right, Grouping):
+            params = criterion.right.element.clauses
         else:
-            # We're using AuthTkt Authentication
-            return User.first(User.email == userid)
+            return None
+
+        if not all(isinstance(param, BindParameter) for param in params):
+            return None
+
+        try:
+            return set(column.type.python_type(param.effective_value)
+                       for param in params)
+        except (TypeError, ValueError):
+            return None
+
+@event.listens_for(DBSession, 'after_commit')
+def invalidate_after_commit(session):
+    """Invalidate the cached users written by the committed transaction."""
+    if 'starter.invalidated_users' in session.info:
+        _invalidate_users(session.info.pop('starter.invalidated_users'))
 
-    return None
+@event.listens_for(DBSession, 'after_transaction_end')
+def discard_invalidations(session, transaction):
+    """
+    Forget the cached users written by a transaction which ended without
+    committing (e.g. rolled back, or closed when the request was aborted).
+    """
+    if transaction.parent is None:
+        session.info.pop('starter.invalidated_users', None)
@@ -0,0 +1,121 @@
+"""
+Templating
+----------
+
+Jinja2 extensions (registered via the ``jinja2.extensions`` setting) and
+template helpers.
+"""
+# System imports
+import os
+
+# 3rd party imports
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+# Pyramid imports
+from pyramid.path import DottedNameResolver
+
+# Project imports
+from .cache import Cache
+from .settings import SETTINGS
+
+
+# Rendered template block cache (see: ``CacheExtension``)
+fragment_cache = Cache(max_size=1000, ttl=300)
+
+
+class CacheExtension(Extension):
+    """
+    Jinja2 extension adding a ``{% cache key[, ttl] %}...{% endcache %}`` tag,
+    which renders its block once and then serves the output from a cache
+    (for ``ttl`` seconds, or the ``cache.fragments.ttl`` setting)::
+
+        {% cache 'user-stats', 300 %}
+          {{ expensive_widget() }}
+        {% endcache %}
+
+    Keys are scoped to the template, so only need to be unique within it (but
+    should include anything the block's output depends on).
+
+    By default blocks are cached in memory (``fragment_cache``, bounded by the
+    ``cache.fragments.max_size`` setting). Another store may be configured
+    by setting ``cache.fragments.backend`` to the dotted name of a factory
+    returning an object with ``get(key)`` and ``set(key, value, ttl=None)``
+    methods.
+    """
+    tags = set(['cache'])
+
+    def __init__(self, environment):
+        super(CacheExtension, self).__init__(environment)
+
+        backend = SETTINGS.get('cache.fragments.backend')
+
+        environment.extend(
+            fragment_cache=DottedNameResolver().maybe_resolve(backend)()
+                           if backend else fragment_cache
+        )
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        # Scope the key to the template
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+
+        return nodes.CallBlock(self.call_method('_cache', args), [], [], body) \
+                    .set_lineno(lineno)
+
+    def _cache(self, name, key, ttl, caller):
+        """Return the cached output of the block, rendering it if missing."""
+        cache = self.environment.fragment_cache
+        key = ('fragment', name, key)
+        value = cache.get(key)
+
+        if value is None:
+            value = caller()
+            cache.set(key, value, ttl=ttl)
+
+        return value
+
+def precompile_templates(environment, extensions=('.jinja2',)):
+    """
+    Load (i.e. compile) every template (with one of the given file
+    ``extensions``) under ``environment``'s loader search path, returning the
+    names of the loaded templates.
+
+    Compiled templates are kept in the environment's template cache, and
+    written to its bytecode cache (if any) so that other processes can skip
+    compiling them too.
+
+    .. note:: Templates are cached by the name they're loaded with, so
+              templates which are also referenced by another name (e.g.
+              ``"/layout_default.jinja2"``) are compiled again on first use
+              under that name (but only once across processes when a
+              bytecode cache is configured).
+    """
+    paths = set()
+    names = []
+
+    # Walk the search path ourselves (pyramid_jinja2's loader can't list its
+    # templates), naming each template relative to the first directory it's
+    # found under
+    for searchpath in environment.loader.searchpath:
+        for dirpath, dirnames, filenames in os.walk(searchpath):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+
+                if filename.endswith(extensions) and path not in paths:
+                    paths.add(path)
+                    names.append(os.path.relpath(path, searchpath)
+                                   .replace(os.sep, '/'))
+
+    for name in names:
+        environment.get_template(name)
+
+    return names
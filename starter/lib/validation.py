@@ -15,6 +15,9 @@ from formencode.validators import FieldsMatch, UnicodeString, Int, Email, OneOf
 from pyramid.session import check_csrf_token
 from pyramid.httpexceptions import HTTPBadRequest
 
+# Project imports
+from .packing import MEDIA_TYPES as MSGPACK_TYPES, unpackb
+
 
 # Give formencode's "Invalid" class a __json__ method
 Invalid.__json__ = lambda obj, request: str(obj)
@@ -41,6 +44,8 @@ class UserUpdateSchema(Schema):
     role = OneOf(('user', 'superuser', 'admin'), hideList=True, not_empty=True)
 
     class profile(Schema):
+        ignore_key_missing = True
+
         first_name = UnicodeString(max=100, not_empty=True)
         last_name = UnicodeString(max=100, not_empty=True)
 
@@ -95,7 +100,7 @@ class validate(object):
         current request method is not in this list then no validation will be
         performed.
 
-        Currently only GET and POST are supported.
+        Currently only GET, POST, PUT and PATCH are supported.
 
         .. warning::
             This parameter also determines where submitted data is read from.
@@ -107,16 +112,17 @@ class validate(object):
         object.
     ``verify_csrf``
         Whether to verify CSRF token via Pyramid's ``session.check_csrf_token``
-        method (POST requests only--defaults to True).
+        method (POST, PUT and PATCH requests only--defaults to True).
     ``allow_json``
         Whether to parse submitted data from ``request.json`` if the request
-        content-type matches "application/json"
+        content-type matches "application/json" (or from the MessagePack
+        encoded body if it's "application/msgpack")
 
         .. warning::
             If ``allow_json`` is True, ``verify_csrf`` is automatically set to
-            False when parsing JSON data, which could open your app up to CSRF
-            attacks if you aren't verifying identity via other means (e.g. API
-            token verification).
+            False when parsing JSON (or MessagePack) data, which could open
+            your app up to CSRF attacks if you aren't verifying identity via
+            other means (e.g. API token verification).
 
     .. note::
         This specific flavor of the @validate decorator is meant to be used with
@@ -139,7 +145,7 @@ class validate(object):
         self.schema = schema
         self.validators = validators
         self.methods = [x.upper() for x in methods \
-                        if x.upper() in ['GET', 'POST']]
+                        if x.upper() in ['GET', 'POST', 'PUT', 'PATCH']]
         self.state = state
         self.verify_csrf = verify_csrf
         self.allow_json = allow_json
@@ -152,6 +158,8 @@ class validate(object):
             cls.validation_results = dict()
 
             if request.method.upper() in self.methods:
+                verify_csrf = self.verify_csrf
+
                 if self.allow_json and \
                    request.content_type.startswith('application/json'):
                     # Parse JSON body instead of HTTP POST vars
@@ -162,14 +170,25 @@ class validate(object):
                     else:
                         # Don't verify CSRF for JSON requests, as Auth headers
                         # should always be sent.
-                        self.verify_csrf = False
-                elif len(self.methods) > 1:
+                        verify_csrf = False
+                elif self.allow_json and request.content_type in MSGPACK_TYPES:
+                    # Parse MessagePack body (as for JSON above)
+                    try:
+                        params = unpackb(request.body)
+                    except ValueError:
+                        raise HTTPBadRequest
+                    else:
+                        verify_csrf = False
+                elif len(self.methods) > 1 and 'GET' in self.methods:
                     params = request.params.mixed()
+                elif request.method.upper() == 'GET':
+                    params = request.GET
                 else:
-                    params = getattr(request, self.methods[0])
+                    # WebOb parses PUT and PATCH form bodies into POST too
+                    params = request.POST
 
                 # Validate CSRF
-                if self.verify_csrf and request.method.upper() == 'POST':
+                if verify_csrf and request.method.upper() != 'GET':
                     check_csrf_token(request)
                     del params['csrf_token']
 
@@ -0,0 +1,126 @@
+"""
+Warm-up
+-------
+
+Work which would otherwise be done by the first request(s) a worker serves,
+run once the application has been created (see :py:func:`warm_up`).
+"""
+# System imports
+import time
+import logging
+
+# 3rd party imports
+from sqlalchemy.orm import configure_mappers
+
+# Pyramid imports
+from pyramid.request import Request
+from pyramid.settings import asbool, aslist
+from pyramid_jinja2 import IJinja2Environment
+
+# Project imports
+from .replicas import replicas
+from .templating import precompile_templates
+from ..models import Base
+
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(event):
+    """
+    ``ApplicationCreated`` subscriber which warms up the application by:
+
+    * configuring the SQLAlchemy mappers;
+    * opening ``warmup.connections`` (default 0) pooled database connections
+      (to the primary database and to each read replica);
+    * compiling every template (if ``templates.precompile`` is enabled);
+    * issuing an internal ``GET`` request for each of the ``warmup.requests``
+      (one per line, as a path optionally followed by an ``Accept`` value,
+      e.g. ``/api/ application/json``). These bypass the page cache, as
+      they're for ``localhost`` rather than the hosts real requests are for.
+
+    The number of seconds spent on each phase is logged, and kept (along with
+    the total) in the registry's ``warmup_timings`` dict.
+    """
+    app = event.app
+    settings = app.registry.settings
+    timings = app.registry.warmup_timings = {}
+    start = time.time()
+
+    # Configure the mappers (normally done on first query)
+    with _timed(timings, 'mappers'):
+        configure_mappers()
+
+    # Fill the connection pool
+    connections = int(settings.get('warmup.connections', 0))
+
+    if connections and Base.metadata.bind is not None:
+        with _timed(timings, 'connections'):
+            for engine in [Base.metadata.bind] + replicas.engines:
+                _open_connections(engine, connections)
+
+    # Compile all templates up front (rather than on first use)
+    if asbool(settings.get('templates.precompile')):
+        with _timed(timings, 'templates'):
+            environment = app.registry.queryUtility(IJinja2Environment,
+                                                    name='.jinja2')
+            precompile_templates(environment)
+
+    # Run requests through the whole application (tweens, routes, views...)
+    lines = aslist(settings.get('warmup.requests', ''), flatten=False)
+
+    if lines:
+        with _timed(timings, 'requests'):
+            for line in lines:
+                _request(app, *line.split(None, 1))
+
+    timings['total'] = time.time() - start
+
+    logger.info('Warmed up in %.3fs (%s)' % (
+        timings['total'],
+        ', '.join('%s: %.3fs' % (name, timings[name])
+                  for name in ('mappers', 'connections', 'templates',
+                               'requests')
+                  if name in timings)
+    ))
+
+def _open_connections(engine, count):
+    """
+    Open (and then release) ``count`` simultaneous connections to ``engine``,
+    leaving them in its pool.
+    """
+    connections = []
+
+    try:
+        for i in range(count):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+def _request(app, path, accept='text/html'):
+    """Issue an internal ``GET`` request for ``path`` to ``app``."""
+    request = Request.blank(path, headers={'Accept': accept},
+                            environ={'starter.warmup': True})
+
+    try:
+        response = request.get_response(app)
+    except Exception as exc:
+        logger.warning('Warm-up request for %s failed: %s' % (path, exc))
+    else:
+        if response.status_int >= 500:
+            logger.warning('Warm-up request for %s failed: %s' %
+                           (path, response.status))
+
+
+class _timed(object):
+    """Context manager adding the time spent within it to ``timings``."""
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        self.timings[self.name] = time.time() - self.start
@@ -2,19 +2,98 @@
 Models Module
 -------------
 """
+from contextlib import contextmanager
 from importlib import import_module
-from sqlalchemy import func
+from sqlalchemy import func, select, and_, inspect
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import Comparator
-from sqlalchemy.orm import scoped_session, sessionmaker, lazyload
+from sqlalchemy.orm import (scoped_session, sessionmaker, lazyload, joinedload,
+                            subqueryload, load_only, Session)
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.sql.expression import Select, UpdateBase
+from sqlalchemy.types import Boolean, DateTime, Float, Integer, String
 from zope.sqlalchemy import ZopeTransactionExtension
-from marshmallow import SchemaOpts
+from marshmallow import SchemaOpts, fields as schema_fields
+from ..lib.cache import Cache
+
+
+# Define the routing Session class
+class RoutingSession(Session):
+    """
+    A Session which can route reads to a read replica.
+
+    Everything goes to the session's bind (the primary database) unless a
+    ``replica`` engine was set with :py:meth:`route` (see:
+    ``starter.lib.replicas.replica_tween_factory``) and reads have been
+    enabled with :py:meth:`use_replica` or :py:meth:`reading_from_replica`,
+    in which case ``SELECT`` queries go to the replica.
+
+    Once the session has written anything (i.e. flushed, or executed an
+    ``INSERT``/``UPDATE``/``DELETE``), it's ``pinned`` to the primary so that
+    later reads see the writes.
+    """
+    def __init__(self, **kwargs):
+        super(RoutingSession, self).__init__(**kwargs)
+        self.route()
+
+    def route(self, replica=None):
+        """
+        Reset the session's routing, so that reads (once enabled) go to the
+        ``replica`` engine (if given).
+        """
+        self.replica = replica
+        self.reads_from_replica = False
+        self.pinned = False
+
+    def use_replica(self, enabled=True):
+        """Route (or stop routing) reads to the replica."""
+        self.reads_from_replica = enabled
+
+    @contextmanager
+    def reading_from_replica(self, enabled=True):
+        """
+        Route reads to the replica (or to the primary, if not ``enabled``)
+        within the ``with`` block.
+        """
+        previous = self.reads_from_replica
+        self.reads_from_replica = enabled
+
+        try:
+            yield self
+        finally:
+            self.reads_from_replica = previous
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.pinned = True
+        elif self.replica is not None and self.reads_from_replica and \
+             not self.pinned and (clause is None or isinstance(clause, Select)):
+            return self.replica
+
+        return super(RoutingSession, self).get_bind(mapper, clause)
 
 
 # Initialize the Base and Session
 Base = declarative_base()
-DBSession = scoped_session(sessionmaker(extension=ZopeTransactionExtension()))
+DBSession = scoped_session(sessionmaker(class_=RoutingSession,
+                                        extension=ZopeTransactionExtension()))
+
+# Initialize the row count cache (see: ``ModelMixin.count``)
+count_cache = Cache(max_size=1000, ttl=60, stale_ttl=300)
+# Initialize the compiled JSON serializer cache (see: ``ModelMixin.__json__``)
+serializer_cache = Cache(max_size=256)
+# Initialize the encoded JSON document cache (see: ``APIView._json_document``)
+document_cache = Cache(max_size=1000)
+
+# Map SQLAlchemy column types to marshmallow fields (checked in order)
+JSON_FIELD_TYPES = (
+    (Boolean, schema_fields.Boolean),
+    (DateTime, schema_fields.DateTime),
+    (Integer, schema_fields.Integer),
+    (Float, schema_fields.Float),
+    (String, schema_fields.String),
+)
 
 
 # Define the Model class mixin
@@ -81,15 +160,34 @@ class ModelMixin:
         return cls.query.filter(*filters).all()
 
     @classmethod
-    def count(cls, *filters):
+    def count(cls, *filters, cache=False):
         """
         Convenience method for getting a count of all rows (optionally
         :py:meth:`filter` by passing ``filters``).
+
+        If ``cache`` is true, the count is served from ``count_cache`` (keyed
+        by model and filter expression) rather than counted every time. Cached
+        counts only reflect committed rows, and may be stale by up to the
+        cache's ``ttl`` plus ``stale_ttl`` seconds.
         """
-        return DBSession.query(func.count('*')) \
-                        .select_from(cls) \
-                        .filter(*filters) \
-                        .scalar()
+        if not cache:
+            return DBSession.query(func.count('*')) \
+                            .select_from(cls) \
+                            .filter(*filters) \
+                            .scalar()
+
+        statement = select([func.count('*')]).select_from(cls.__table__)
+
+        if filters:
+            statement = statement.where(and_(*filters))
+
+        compiled = statement.compile()
+        key = (cls.__name__, str(compiled),
+               repr(sorted(compiled.params.items())))
+        # Resolve the bind now, as the count may be refreshed on another thread
+        bind = DBSession.get_bind(cls)
+
+        return count_cache.fetch(key, lambda: bind.scalar(statement))
 
     @classmethod
     def filter(cls, *criterion):
@@ -154,46 +252,213 @@ class ModelMixin:
         class with a naming convention of ``ModelNameJSON``. If not found, None
         (``null``) will be returned.
         """
-        # Look for a JSON schema class for this object
-        models = import_module('starter.models')
-        cls = getattr(models, '%sJSON' % self.__class__.__name__, None)
+        serializer = self.__class__.json_serializer(
+            request.GET.get('fields', ''),
+            request.GET.get('include', '')
+        )
 
         # Return None if no JSON schema class was found
-        if not cls:
+        if not serializer:
+            return None
+
+        return serializer.dump(self, update_fields=False).data
+
+    @classmethod
+    def json_serializer(cls, fields='', include=''):
+        """
+        Return the (shared) :py:class:`marshmallow.Schema` instance that
+        serializes this model with the given comma separated ``fields``
+        (sparse fieldset) and ``include`` (linked resources) values.
+
+        Serializers are compiled once per combination and held in
+        ``serializer_cache``. Each one has its fields declared up front, so it
+        can be used by any number of threads (as long as ``dump`` is called
+        with ``update_fields=False``).
+        """
+        key = (cls, fields, include)
+        serializer = serializer_cache.get(key, False)
+
+        if serializer is False:
+            serializer = cls._compile_json_serializer(
+                [field for field in fields.split(',') if field],
+                [field for field in include.split(',') if field]
+            )
+            serializer_cache.set(key, serializer)
+
+        return serializer
+
+    @classmethod
+    def json_query(cls, request):
+        """
+        Return a query for this model with loader options planned for
+        serializing its results as JSON for ``request`` (see
+        :py:meth:`json_loader_options`).
+        """
+        return cls.query.options(*cls.json_loader_options(
+            request.GET.get('fields', ''),
+            request.GET.get('include', '')
+        ))
+
+    @classmethod
+    def json_loader_options(cls, fields='', include='', collections=True):
+        """
+        Return the loader options which eagerly load every relationship that
+        the JSON serializer for ``fields``/``include`` (see
+        :py:meth:`json_serializer`) will access, including those of nested
+        related models. This keeps the number of statements per query bounded
+        rather than lazy loading the relationships of each row.
+
+        Single object relationships are loaded with
+        :py:func:`~sqlalchemy.orm.joinedload`, and collections with
+        :py:func:`~sqlalchemy.orm.subqueryload` (or not at all if
+        ``collections`` is false, e.g. for queries using ``yield_per``).
+
+        When ``fields`` (a sparse fieldset) is given, only the columns needed
+        to serialize each model are loaded (see :py:meth:`json_load_columns`).
+        """
+        options = []
+        columns = cls.json_load_columns(fields, include)
+
+        if columns:
+            options.append(load_only(*columns))
+
+        for path in cls._json_load_paths(fields, include):
+            if not collections and any(uselist for attr, uselist in path):
+                continue
+
+            option = None
+
+            for attr, uselist in path:
+                strategy = 'subqueryload' if uselist else 'joinedload'
+                if option is None:
+                    option = (subqueryload if uselist else joinedload)(attr)
+                else:
+                    option = getattr(option, strategy)(attr)
+
+            related = path[-1][0].property.mapper.class_
+
+            if issubclass(related, ModelMixin):
+                columns = related.json_load_columns(fields, include)
+
+                if columns:
+                    option = option.load_only(*columns)
+
+            options.append(option)
+
+        return options
+
+    @classmethod
+    def json_load_columns(cls, fields='', include=''):
+        """
+        Return the keys of the column attributes needed to serialize this
+        model for the ``fields`` sparse fieldset (always including the primary
+        key, and any columns that the serialized relationships join on).
+
+        Returns None if every column should be loaded, i.e. if no ``fields``
+        were given or a serialized field doesn't map to a column.
+        """
+        serializer = cls.json_serializer(fields, include) if fields else None
+
+        if not serializer:
+            return None
+
+        mapper = inspect(cls)
+        columns = list(mapper.primary_key)
+
+        for name in serializer.opts.fields:
+            if name in cls.__table__.columns:
+                columns.append(cls.__table__.columns[name])
+            elif name in mapper.relationships:
+                columns.extend(mapper.relationships[name].local_columns)
+            else:
+                return None
+
+        keys = [mapper.get_property_by_column(column).key
+                for column in columns]
+
+        return sorted(set(keys), key=keys.index)
+
+    @classmethod
+    def _json_load_paths(cls, fields, include, seen=()):
+        """
+        Return the ``(attribute, uselist)`` relationship paths serialized for
+        ``fields``/``include``, skipping paths that lead back to a model
+        already on the path.
+        """
+        serializer = cls.json_serializer(fields, include)
+
+        if not serializer:
+            return []
+
+        relationships = inspect(cls).relationships
+        seen = seen + (cls,)
+        paths = []
+
+        for name in serializer.opts.fields:
+            if name not in relationships:
+                continue
+
+            relationship = relationships[name]
+            related = relationship.mapper.class_
+
+            if related in seen:
+                continue
+
+            path = ((getattr(cls, name), relationship.uselist),)
+            paths.append(path)
+
+            if issubclass(related, ModelMixin):
+                paths.extend(path + subpath for subpath in
+                             related._json_load_paths(fields, include, seen))
+
+        return paths
+
+    @classmethod
+    def _compile_json_serializer(cls, fields, include):
+        """Build a serializer instance (see :py:meth:`json_serializer`)."""
+        # Look for a JSON schema class for this model
+        models = import_module('starter.models')
+        schema = getattr(models, '%sJSON' % cls.__name__, None)
+
+        if not schema:
             return None
 
-        # Initialize the JSON class
-        json = cls()
-        # Back up fields attr, in case it's modified via the include param
-        original_fields = json.Meta.fields[:]
+        supported = getattr(schema.Meta, 'supported_fields', None) or []
+        exclude = getattr(schema.Meta, 'exclude', None) or []
+        names = list(getattr(schema.Meta, 'fields', None) or [])
 
         # Partial support for linked resource inclusion
         # http://jsonapi.org/format/#fetching-includes
-        if request.GET.get('include'):
-            json.Meta.fields.extend(
-                [field for field in request.GET['include'].split(',')
-                 if field in getattr(json.Meta, 'supported_fields', []) and
-                 field not in getattr(json.Meta, 'fields', []) and
-                 field not in getattr(json.Meta, 'exclude', [])]
-            )
+        names.extend([field for field in include
+                      if field in supported and
+                         field not in names and
+                         field not in exclude])
 
         # Partial support for sparse fieldsets
         # http://jsonapi.org/format/#fetching-sparse-fieldsets
-        if request.GET.get('fields'):
-            json.only = [
-                field for field in request.GET['fields'].split(',')
-                if field in getattr(json.Meta, 'supported_fields', []) and
-                   field not in getattr(json.Meta, 'exclude', [])
-            ]
+        only = [field for field in fields
+                if field in supported and field not in exclude]
+
+        names = [name for name in (only or names) if name not in exclude]
+
+        # Declare each field up front, rather than having marshmallow infer
+        # (and store) field types from whichever object it serializes first
+        attrs = dict((name, cls._json_field(name)) for name in names)
+        attrs['Meta'] = type('Meta', (schema.Meta,), dict(fields=names))
 
-        # Initialize the serialized data
-        data = json.dump(self).data
+        return type(schema.__name__, (schema,), attrs)()
+
+    @classmethod
+    def _json_field(cls, name):
+        """Return the marshmallow field for the attribute called ``name``."""
+        column = cls.__table__.columns.get(name)
 
-        # Restore the original fields attr if it was modified
-        if json.Meta.fields != original_fields:
-            json.Meta.fields = original_fields
+        if column is not None:
+            for type_, field in JSON_FIELD_TYPES:
+                if isinstance(column.type, type_):
+                    return field()
 
-        return data
+        return schema_fields.Field()
 
 
 # Adds a "supported_fields" option to Marshmallow schema Meta options
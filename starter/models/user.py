@@ -5,14 +5,15 @@ User Model
 Model module for User related functionality.
 """
 # System imports
+import hashlib
 from datetime import datetime
 
 # 3rd party imports
-from cryptacular import bcrypt
 from sqlalchemy import Column, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import Integer, DateTime, Unicode
 from sqlalchemy.ext.hybrid import hybrid_property
+from zope.sqlalchemy import mark_changed
 from marshmallow import Schema
 
 # Pyramid imports
@@ -23,12 +24,11 @@ from pyramid.authentication import b64encode
 from . import (DBSession, Base, ModelMixin, CaseInsensitiveComparator,
                JSONFieldOpts)
 from ..lib.helpers import generate_secret
+from ..lib.hashing import hasher
 
 
 __all__ = ['User', 'UserProfile', 'UserJSON', 'UserProfileJSON']
 
-crypt = bcrypt.BCRYPTPasswordManager()
-
 
 # User model class
 class User(ModelMixin, Base):
@@ -64,9 +64,170 @@ class User(ModelMixin, Base):
         """
         return cls.filter_by(email=email).one()
 
+    @classmethod
+    def etag(cls, id, *parts):
+        """
+        Return a strong ETag for the user whose id is ``id`` (or None if no
+        such user exists) computed from their (and their profile's)
+        ``updated`` timestamp, along with any extra ``parts`` (e.g. the
+        requested fields).
+
+        Only the timestamps are queried, so the ETag can be checked before
+        loading the user.
+        """
+        versions = DBSession.query(cls.updated, UserProfile.updated) \
+                            .outerjoin(UserProfile,
+                                       UserProfile.user_id == cls.id) \
+                            .filter(cls.id == id) \
+                            .first()
+
+        if versions is None:
+            return None
+
+        key = repr((cls.__name__, id) + tuple(versions) + parts)
+
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def bulk_create(cls, values, batch_size=500):
+        """
+        Create a user (and profile) for each dict in ``values`` (with
+        ``email``, ``password``, ``role`` and ``profile`` keys, as validated
+        by ``UserCreateSchema``), returning the new users' ids in order.
+
+        Rather than adding and flushing ORM objects one by one, passwords are
+        hashed in parallel on the hashing pool and rows are inserted
+        ``batch_size`` at a time with "executemany" ``INSERT`` statements.
+
+        .. note:: Email addresses are expected to be unique (a unique
+                  constraint violation will fail the whole call).
+        """
+        ids = []
+
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+            passwords = hasher.encode_many(
+                [value.get('password') or generate_secret() for value in batch]
+            )
+            emails = [value['email'].lower() for value in batch]
+
+            DBSession.execute(cls.__table__.insert(), [
+                dict(email=email, password=password,
+                     role=value.get('role') or 'user')
+                for email, password, value in zip(emails, passwords, batch)
+            ])
+
+            # Look up the generated primary keys by (unique) email address
+            users = dict(DBSession.query(cls._email, cls.id)
+                                  .filter(cls._email.in_(emails)))
+
+            DBSession.execute(UserProfile.__table__.insert(), [
+                dict(value.get('profile') or {}, user_id=users[email])
+                for email, value in zip(emails, batch)
+            ])
+
+            ids.extend(users[email] for email in emails)
+
+        # Let the transaction manager know the session has been written to
+        mark_changed(DBSession())
+
+        return ids
+
+    @classmethod
+    def bulk_update(cls, ids, values):
+        """
+        Apply ``values`` (as validated by ``UserUpdateSchema``, including an
+        optional ``profile`` dict) to every user whose id is in ``ids`` with
+        set-based ``UPDATE`` statements (one per table), rather than loading
+        each user. Returns the number of users matched.
+
+        .. note:: Objects already loaded into the session aren't refreshed.
+        """
+        values = dict(values)
+        profile = values.pop('profile', None) or {}
+        updates = cls._column_values(values)
+        count = 0
+
+        if updates:
+            count = cls.filter(cls.id.in_(ids)) \
+                       .update(updates, synchronize_session=False)
+
+        if profile:
+            profile_count = UserProfile.filter(UserProfile.user_id.in_(ids)) \
+                                       .update(profile,
+                                               synchronize_session=False)
+            count = count or profile_count
+
+        return count
+
+    @classmethod
+    def partial_update(cls, id, values):
+        """
+        Apply ``values`` (as validated by ``UserUpdateSchema``, including an
+        optional ``profile`` dict) to the user whose id is ``id`` with at most
+        one ``UPDATE`` statement per table, rather than loading the user
+        first. Returns False if no such user exists.
+
+        A profile is created for the user if they don't have one yet.
+
+        .. note:: Objects already loaded into the session aren't refreshed.
+        """
+        values = dict(values)
+        profile = values.pop('profile', None) or {}
+        updates = cls._column_values(values)
+
+        if updates and not cls.filter(cls.id == id) \
+                              .update(updates, synchronize_session=False):
+            return False
+
+        if profile and not UserProfile.filter(UserProfile.user_id == id) \
+                                      .update(profile,
+                                              synchronize_session=False):
+            # Either the user or their profile doesn't exist
+            if not updates and not DBSession.query(
+                cls.filter(cls.id == id).exists()
+            ).scalar():
+                return False
+
+            DBSession.add(UserProfile(user_id=id, **profile))
+
+        return True
+
+    @classmethod
+    def bulk_delete(cls, ids):
+        """
+        Delete every user (and profile) whose id is in ``ids`` with set-based
+        ``DELETE`` statements, rather than loading and cascading to each
+        user. Returns the number of users deleted.
+        """
+        UserProfile.filter(UserProfile.user_id.in_(ids)) \
+                   .delete(synchronize_session=False)
+
+        return cls.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+
+    @classmethod
+    def _column_values(cls, values):
+        """
+        Map a dict of ``values`` keyed by attribute name to a dict keyed by
+        column (as expected by :py:meth:`sqlalchemy.orm.query.Query.update`),
+        normalizing the email address and hashing the password on the way.
+        """
+        columns = dict(email=cls._email, password=cls._password)
+        updates = {}
+
+        for key, value in values.items():
+            if key == 'email':
+                value = value.lower()
+            elif key == 'password':
+                value = hasher.encode(value)
+
+            updates[columns.get(key) or getattr(cls, key)] = value
+
+        return updates
+
     ## Instance methods ##
     def check_password(self, value):
-        return crypt.check(self.password, value)
+        return hasher.check(self.password, value)
 
     ## Object properties ##
     @property
@@ -95,7 +256,7 @@ class User(ModelMixin, Base):
 
     @password.setter
     def password(self, value):
-        self._password = crypt.encode(value)
+        self._password = hasher.encode(value)
 
     ## Special methods ##
     def __init__(self, email='', password=None, role='user', profile=None):
@@ -113,7 +274,7 @@ class UserJSON(Schema):
     OPTIONS_CLASS = JSONFieldOpts
 
     class Meta:
-        supported_fields = list(User._sa_class_manager.keys())
+        supported_fields = User.__table__.columns.keys() + ['profile']
         fields = User.__table__.columns.keys()
         exclude = ('api_token', 'password', 'password_reset_sent',
                    'password_reset_token')
@@ -152,5 +313,5 @@ class UserProfileJSON(Schema):
     OPTIONS_CLASS = JSONFieldOpts
 
     class Meta:
-        supported_fields = list(UserProfile._sa_class_manager.keys())
+        supported_fields = UserProfile.__table__.columns.keys()
         fields = UserProfile.__table__.columns.keys()
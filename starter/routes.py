@@ -4,13 +4,28 @@ Starter routes.
 TBD
 """
 from .views import *
+from .lib.hashing import HashingUnavailable
+from .lib.assets import asset_view
+from .lib.static import StaticView
+
+# API routes match requests accepting JSON or MessagePack responses
+API_ACCEPT = 'Accept:application/(json|msgpack|x-msgpack)'
 
 # Register routes
 # http://docs.pylonsproject.org/projects/pyramid/en/latest/narr/urldispatch.html#route-configuration
 def includeme(config):
     # System routes
     config.add_static_view('static', 'static', cache_max_age=3600)
+    # Serve GET/HEAD requests for static files with .lib.static.StaticView
+    # (rather than the static view added above)
+    config.add_view(StaticView('starter:static', cache_max_age=3600),
+                    route_name='__static/',
+                    request_method=('GET', 'HEAD'))
+    config.add_route('assets', '/assets/*subpath')
+    config.add_view(asset_view, route_name='assets') # .lib.assets.asset_view
     config.add_forbidden_view(forbidden) # .views.forbidden
+    config.add_view(service_unavailable, # .views.service_unavailable
+                    context=HashingUnavailable)
 
     # Root - /
 
@@ -53,42 +68,70 @@ def includeme(config):
                        handler=APIRoot,
                        action='index',
                        request_method='GET',
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
     # GET /api/users[.json|/] -> api.users:APIUsers.index
     config.add_handler('api_users_index',
                        pattern='/api/users{_:(\.json|/)?}',
                        handler=APIUsers,
                        action='index',
                        request_method='GET',
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
     # POST /api/users[.json|/] -> api.users:APIUsers.create
     config.add_handler('api_users_create',
                        pattern='/api/users{_:(\.json|/)?}',
                        handler=APIUsers,
                        action='create',
                        request_method='POST',
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
+    # POST /api/users/bulk[.json] -> api.users:APIUsers.bulk_create
+    config.add_handler('api_users_bulk_create',
+                       pattern='/api/users/bulk{_:(\.json)?}',
+                       handler=APIUsers,
+                       action='bulk_create',
+                       request_method='POST',
+                       header=API_ACCEPT)
+    # PATCH/PUT /api/users/bulk[.json] -> api.users:APIUsers.bulk_update
+    config.add_handler('api_users_bulk_update',
+                       pattern='/api/users/bulk{_:(\.json)?}',
+                       handler=APIUsers,
+                       action='bulk_update',
+                       request_method=('PATCH', 'PUT'),
+                       header=API_ACCEPT)
+    # DELETE /api/users/bulk[.json] -> api.users:APIUsers.bulk_delete
+    config.add_handler('api_users_bulk_delete',
+                       pattern='/api/users/bulk{_:(\.json)?}',
+                       handler=APIUsers,
+                       action='bulk_delete',
+                       request_method='DELETE',
+                       header=API_ACCEPT)
+    # GET /api/users/export[.json|.ndjson] -> api.users:APIUsers.export
+    config.add_handler('api_users_export',
+                       pattern='/api/users/export{_:(\.json|\.ndjson)?}',
+                       handler=APIUsers,
+                       action='export',
+                       request_method='GET',
+                       header=API_ACCEPT)
     # GET /api/users/:id[.json] -> api.users:APIUsers.read
     config.add_handler('api_users_read',
                        pattern='/api/users/{id:\d+}{_:(\.json)?}',
                        handler=APIUsers,
                        action='read',
                        request_method='GET',
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
     # PATCH/PUT/POST /api/users/:id[.json] -> api.users:APIUsers.update
     config.add_handler('api_users_update',
                        pattern='/api/users/{id:\d+}{_:(\.json)?}',
                        handler=APIUsers,
                        action='update',
                        request_method=('PATCH', 'PUT', 'POST'),
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
     # DELETE /api/users/:id[.json] -> api.users:APIUsers.delete
     config.add_handler('api_users_delete',
                        pattern='/api/users/{id:\d+}{_:(\.json)?}',
                        handler=APIUsers,
                        action='delete',
                        request_method=('DELETE'),
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
 
     # POST /api/users/login[.json] -> api.users:APIUsers.login
     config.add_handler('api_users_login',
@@ -96,14 +139,14 @@ def includeme(config):
                        handler=APIUsers,
                        action='login',
                        request_method='POST',
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
     # POST /api/users/register[.json] -> api.users:APIUsers.register
     config.add_handler('api_users_register',
                        pattern='/api/users/register{_:(\.json)?}',
                        handler=APIUsers,
                        action='register',
                        request_method='POST',
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
     # POST /api/users/forgot_password[.json]
     # -> api.users:APIUsers.forgot_password
     config.add_handler('api_users_forgot_password',
@@ -111,7 +154,7 @@ def includeme(config):
                        handler=APIUsers,
                        action='forgot_password',
                        request_method='POST',
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
     # POST /api/users/reset_password[.json]
     # -> api.users:APIUsers.reset_password
     config.add_handler('api_users_reset_password',
@@ -119,7 +162,7 @@ def includeme(config):
                        handler=APIUsers,
                        action='reset_password',
                        request_method='POST',
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
 
     # OPTIONS /api/* -> api:APIView.options
     config.add_handler('api_options',
@@ -132,4 +175,4 @@ def includeme(config):
     config.add_handler('api_handler',
                        pattern='/api/{action}.json',
                        handler=APIRoot,
-                       header='Accept:application/json')
+                       header=API_ACCEPT)
@@ -0,0 +1,79 @@
+"""
+Benchmark the app's JSON renderer (``starter.lib.renderers.JSONRenderer``)
+against Pyramid's default one on pages of ``UserJSON`` documents, e.g.::
+
+    python -m starter.scripts.benchjson [users] [iterations]
+"""
+# System imports
+import os
+import sys
+import timeit
+from datetime import datetime
+
+# Pyramid imports
+from pyramid.renderers import JSON
+from pyramid.testing import DummyRequest
+
+# Project imports
+from ..lib.renderers import JSONRenderer
+from ..models import User, UserProfile
+
+
+def usage(argv):
+    cmd = os.path.basename(argv[0])
+    print('usage: %s [users] [iterations]\n'
+          '(example: "%s 100 200")' % (cmd, cmd))
+    sys.exit(1)
+
+
+def main(argv=sys.argv):
+    try:
+        count = int(argv[1]) if len(argv) > 1 else 100
+        iterations = int(argv[2]) if len(argv) > 2 else 200
+    except ValueError:
+        usage(argv)
+
+    # Build a page of (transient) users
+    users = []
+
+    for id in range(1, count + 1):
+        user = User(email='user+%d@example.com' % id, role='user',
+                    profile=UserProfile(first_name='John', last_name='Smith'))
+        user.id = id
+        user.created = user.updated = user.last_login = datetime.utcnow()
+        users.append(user)
+
+    print('%d users, %d iterations (ms per page)' % (count, iterations))
+    print('%-28s %10s %10s %8s' % ('params', 'pyramid', 'starter', 'speedup'))
+
+    for params in ({}, {'fields': 'id,email'}, {'include': 'profile'}):
+        request = DummyRequest(params=params)
+        meta = dict(page=1, page_count=1, item_count=count,
+                    items_per_page=count)
+
+        # The list views used to dump models to dicts for Pyramid's renderer,
+        # but now leave them for the app's renderer to encode
+        baseline = JSON()(None)
+        renderer = JSONRenderer()(None)
+        timings = [
+            timeit.timeit(lambda: baseline(
+                dict(data=[user.__json__(request) for user in users],
+                     meta=meta),
+                dict(request=request)
+            ), number=iterations),
+            timeit.timeit(lambda: renderer(
+                dict(data=users, meta=meta),
+                dict(request=request)
+            ), number=iterations)
+        ]
+
+        print('%-28s %10.3f %10.3f %7.1fx' % (
+            '&'.join('%s=%s' % item for item in params.items()) or '(none)',
+            timings[0] * 1000 / iterations,
+            timings[1] * 1000 / iterations,
+            timings[0] / timings[1]
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# System imports
+import os
+import sys
+
+# Pyramid imports
+from pyramid.paster import get_appsettings, setup_logging
+from pyramid.scripts.common import parse_vars
+
+# Project imports
+from ..lib.assets import build_assets
+
+
+def usage(argv):
+    cmd = os.path.basename(argv[0])
+    # TODO: compat
+    print('usage: %s <config_uri> [var=value]\n'
+          '(example: "%s development.ini")' % (cmd, cmd))
+    sys.exit(1)
+
+
+def main(argv=sys.argv):
+    if len(argv) < 2:
+        usage(argv)
+
+    config_uri = argv[1]
+    options = parse_vars(argv[2:])
+    setup_logging(config_uri)
+    settings = get_appsettings(config_uri, options=options)
+
+    # Build
+    paths = build_assets(settings.get('assets.source', 'starter:static'),
+                         settings['assets.directory'])
+
+    print('Built %d assets into %s' % (len(paths),
+                                       settings['assets.directory']))
@@ -3,14 +3,12 @@ import os
 import sys
 import transaction
 
-# 3rd party imports
-from sqlalchemy import engine_from_config
-
 # Pyramid imports
 from pyramid.paster import get_appsettings, setup_logging
 from pyramid.scripts.common import parse_vars
 
 # Project imports
+from ..lib.replicas import engines_from_config
 from ..models import DBSession, Base, seeds
 
 
@@ -30,7 +28,7 @@ def main(argv=sys.argv):
     options = parse_vars(argv[2:])
     setup_logging(config_uri)
     settings = get_appsettings(config_uri, options=options)
-    engine = engine_from_config(settings, 'sqlalchemy.')
+    engine, replica_engines = engines_from_config(settings)
     DBSession.configure(bind=engine)
     Base.metadata.create_all(engine)
 
@@ -1,11 +1,24 @@
+import os
+import json
+import shutil
 import datetime
 import transaction
+from unittest import mock
 
+from webob import Request
+from webtest import TestApp
 from pyramid.authentication import b64encode
 from pyramid.compat import native_
+from pyramid.paster import get_appsettings
 from pyramid_mailer import get_mailer
 
 from . import FuncTest
+from starter import main
+from starter.lib.hashing import hasher, HashingUnavailable
+from starter.lib.pagination import encode_cursor
+from starter.lib.packing import packb, unpackb
+from starter.lib.replicas import replicas
+from starter.lib.subscribers import user_cache
 from starter.models import *
 
 class TestAPIRoot(FuncTest):
@@ -94,6 +107,68 @@ class TestAPIRoot(FuncTest):
         self.assertIn('email', res.json['data'])
         self.assertEqual(res.json['data']['email'], 'user@example.com')
 
+        # Test authenticated/authorized access (conditional GET)
+        etag = res.headers['ETag']
+        headers['If-None-Match'] = etag
+        res = self.testapp.get('/api/me.json', headers=headers, status=304)
+        self.assertFalse(res.body)
+        self.assertEqual(res.headers['ETag'], etag)
+        res = self.testapp.get('/api/me.json?include=profile',
+                               headers=headers, status=200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_me_cache(self):
+        token = self.user_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.get('/api/me.json', headers=headers, status=200)
+        key = (self.user_user.email, self.user_user.api_token)
+        cached = user_cache.get(key)
+        self.assertEqual(cached.role, 'user')
+
+        # A concurrent request caching the old row between the update's flush
+        # and its commit doesn't outlive the commit
+        with transaction.manager:
+            User.partial_update(self.user_user.id, {'role': 'superuser'})
+            self.assertIsNone(user_cache.get(key))
+            user_cache.set(key, cached)
+
+        self.assertIsNone(user_cache.get(key))
+        res = self.testapp.get('/api/me.json', headers=headers, status=200)
+        self.assertEqual(res.json['data']['role'], 'superuser')
+        self.assertEqual(user_cache.get(key).role, 'superuser')
+
+        # Rolled back writes don't invalidate anything after the fact
+        with transaction.manager:
+            User.partial_update(self.user_user.id, {'role': 'user'})
+            user_cache.set(key, cached)
+            transaction.abort()
+
+        self.assertIs(user_cache.get(key), cached)
+
+        with transaction.manager:
+            self.admin_user.role = 'admin'
+            DBSession.add(self.admin_user)
+
+        self.assertIs(user_cache.get(key), cached)
+
+        # Updating another user leaves this user's identity and documents
+        res = self.testapp.get('/api/users/%s' % self.user_user.id,
+                               headers=headers, status=200)
+        document = ('User', self.user_user.id, res.headers['ETag'].strip('"'),
+                    'application/json')
+        self.assertEqual(document_cache.get(document), res.body)
+        cached = user_cache.get(key)
+        admin = User.filter_by(email='admin@example.com').one()
+        admin_id, token = admin.id, admin.authorization_token
+        self.testapp.patch_json('/api/users/%s' % admin_id,
+                                {'profile': {'first_name': 'Jane'}},
+                                headers=dict(headers,
+                                             Authorization='Token %s' % token),
+                                status=200)
+        self.assertIs(user_cache.get(key), cached)
+        self.assertEqual(document_cache.get(document), res.body)
+
 
 class TestAPIUsers(FuncTest):
     def setUp(self):
@@ -218,6 +293,145 @@ class TestAPIUsers(FuncTest):
         self.assertEqual(res.json['meta']['item_count'], 102)
         self.assertEqual(res.json['meta']['items_per_page'], 100)
 
+    def test_index_cursor(self):
+        # Build 100 new User records, for testing pagination
+        users = [
+            User(
+                email='user+%s@example.com' % i,
+                password='123456',
+                profile=UserProfile(
+                    first_name='User%s' % i,
+                    last_name='User',
+                )
+            )
+            for i in range(100)
+        ]
+
+        with transaction.manager:
+            DBSession.add_all(users)
+
+        token = self.admin_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+
+        # Test first page
+        res = self.testapp.get('/api/users?after=&limit=60', headers=headers,
+                               status=200)
+        self.assertEqual(len(res.json['data']), 60)
+        self.assertEqual(res.json['meta']['after'], None)
+        self.assertEqual(res.json['meta']['items_per_page'], 60)
+        self.assertNotIn('item_count', res.json['meta'])
+        self.assertTrue(res.json['meta']['next'])
+        ids = [item['id'] for item in res.json['data']]
+
+        # Test last page
+        res = self.testapp.get(
+            '/api/users?after=%s&limit=60' % res.json['meta']['next'],
+            headers=headers,
+            status=200
+        )
+        self.assertEqual(len(res.json['data']), 42)
+        self.assertEqual(res.json['meta']['next'], None)
+        ids.extend(item['id'] for item in res.json['data'])
+        self.assertEqual(ids, sorted(set(ids)))
+
+        # Test sorting by email
+        res = self.testapp.get('/api/users?after=&limit=2&sort=email',
+                               headers=headers, status=200)
+        self.assertEqual(res.json['data'][0]['email'], 'admin@example.com')
+        res = self.testapp.get(
+            '/api/users?after=%s&limit=2&sort=email' % res.json['meta']['next'],
+            headers=headers,
+            status=200
+        )
+        self.assertEqual(res.json['data'][0]['email'], 'user+10@example.com')
+
+        # Test invalid cursor/sort
+        res = self.testapp.get('/api/users?after=invalid', headers=headers,
+                               status=400)
+        res = self.testapp.get('/api/users?after=&sort=password',
+                               headers=headers, status=400)
+
+        # Test cursors with values of the wrong type
+        for values, sort in (([[1], 1], 'id'), ([1, {}], 'id'),
+                             ([True, 1], 'id'), ([1, 1], 'email'),
+                             (['user@example.com', '1'], 'email'),
+                             ([{}, 1], 'created')):
+            self.testapp.get('/api/users?after=%s&sort=%s' % (
+                encode_cursor(values), sort
+            ), headers=headers, status=400)
+
+    def test_index_count(self):
+        token = self.admin_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+
+        # Test skipped count
+        res = self.testapp.get('/api/users?count=none', headers=headers,
+                               status=200)
+        self.assertEqual(len(res.json['data']), 2)
+        self.assertEqual(res.json['meta']['page'], 1)
+        self.assertEqual(res.json['meta']['item_count'], None)
+        self.assertEqual(res.json['meta']['page_count'], None)
+
+        # Test estimated count
+        res = self.testapp.get('/api/users?count=estimate', headers=headers,
+                               status=200)
+        self.assertEqual(len(res.json['data']), 2)
+        self.assertEqual(res.json['meta']['item_count'], 2)
+        self.assertEqual(res.json['meta']['page_count'], 1)
+
+        # Test exact count
+        res = self.testapp.get('/api/users?count=exact', headers=headers,
+                               status=200)
+        self.assertEqual(res.json['meta']['item_count'], 2)
+
+    def test_export(self):
+        # Test unauthenticated/unauthorized access
+        headers = {'Accept': 'application/json'}
+        res = self.testapp.get('/api/users/export.json', headers=headers,
+                               status=401)
+
+        # Test authenticated/unauthorized access
+        token = self.user_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.get('/api/users/export.json', headers=headers,
+                               status=403)
+
+        # Test authenticated/authorized access -- JSON array
+        token = self.admin_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.get('/api/users/export.json?include=profile',
+                               headers=headers, status=200)
+        self.assertEqual(len(res.json), 2)
+        self.assertEqual(res.json[0]['email'], 'admin@example.com')
+        self.assertEqual(res.json[1]['profile']['first_name'], 'User')
+
+        # Test authenticated/authorized access -- NDJSON
+        res = self.testapp.get('/api/users/export.ndjson', headers=headers,
+                               status=200)
+        self.assertEqual(res.content_type, 'application/x-ndjson')
+        lines = res.text.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"email":"user@example.com"', lines[1])
+
+        # Test streamed compression (bypassing WebTest, which decodes
+        # responses)
+        headers['Accept-Encoding'] = 'gzip'
+        req = Request.blank('/api/users/export.ndjson', headers=headers)
+        res = req.get_response(self.testapp.app)
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', res.headers)
+        res.decode_content()
+        self.assertEqual(res.text.splitlines(), lines)
+
+        # Test streaming from the index
+        res = self.testapp.get('/api/users?stream=json', headers=headers,
+                               status=200)
+        self.assertEqual(len(res.json), 2)
+
     def test_create(self):
         data = {'email': 'test@example.com', 'password': '654321',
                 'profile': {'first_name': 'John', 'last_name': 'Smith'}}
@@ -303,6 +517,84 @@ class TestAPIUsers(FuncTest):
         self.assertIn('id', res.json['data'])
         self.assertEqual(res.json['data']['email'], 'test-json@example.com')
 
+    def test_bulk_create(self):
+        data = [
+            {'email': 'bulk+%s@example.com' % i, 'password': '654321',
+             'profile': {'first_name': 'Bulk%s' % i, 'last_name': 'User'}}
+            for i in range(3)
+        ]
+
+        # Test authenticated/unauthorized access
+        token = self.user_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.post_json('/api/users/bulk', data, headers=headers,
+                                     status=403)
+
+        # Test authenticated/authorized access -- invalid body
+        token = self.admin_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.post_json('/api/users/bulk', {}, headers=headers,
+                                     status=400)
+
+        # Test authenticated/authorized access -- valid data
+        res = self.testapp.post_json('/api/users/bulk', data, headers=headers,
+                                     status=201)
+        self.assertEqual(len(res.json['data']), 3)
+        self.assertEqual(res.json['errors'], [None, None, None])
+        self.assertEqual(res.json['data'][0]['email'], 'bulk+0@example.com')
+
+        # Re-read the resource to verify create
+        res = self.testapp.get('/api/users/%s?include=profile' %
+                               res.json['data'][2]['id'],
+                               headers=headers, status=200)
+        self.assertEqual(res.json['data']['email'], 'bulk+2@example.com')
+        self.assertEqual(res.json['data']['profile']['first_name'], 'Bulk2')
+        self.assertTrue(User.by_email('bulk+2@example.com')
+                            .check_password('654321'))
+
+        # Test authenticated/authorized access -- partially invalid (NDJSON)
+        data = [
+            {'email': 'BULK+3@example.com', 'password': '654321',
+             'profile': {'first_name': 'Bulk', 'last_name': 'User'}},
+            {'email': 'bulk+3@example.com', 'password': '654321',
+             'profile': {'first_name': 'Bulk', 'last_name': 'User'}},
+            {'email': 'user@example.com', 'password': '654321',
+             'profile': {'first_name': 'Bulk', 'last_name': 'User'}},
+            {'email': 'invalid'},
+        ]
+        body = '\n'.join(json.dumps(item) for item in data)
+        res = self.testapp.post('/api/users/bulk.json', body,
+                                headers=headers,
+                                content_type='application/x-ndjson',
+                                status=200)
+        self.assertEqual(res.json['data'][0]['email'], 'bulk+3@example.com')
+        self.assertEqual(res.json['data'][1:], [None, None, None])
+        self.assertEqual(res.json['errors'][0], None)
+        self.assertEqual(res.json['errors'][1]['email'],
+                         'Email address must be unique')
+        self.assertEqual(res.json['errors'][2]['email'],
+                         'Email address must be unique')
+        self.assertIn('email', res.json['errors'][3])
+        self.assertIn('profile', res.json['errors'][3])
+
+        # Test authenticated/authorized access -- hashing pool saturated after
+        # the first batch (nothing is committed)
+        count = User.count()
+        data = [{'email': 'saturated+%s@example.com' % i, 'password': '654321',
+                 'profile': {'first_name': 'Bulk', 'last_name': 'User'}}
+                for i in range(501)]
+        batches = [['hash'] * 500, HashingUnavailable()]
+
+        with mock.patch.object(hasher, 'encode_many',
+                               side_effect=batches) as encode_many:
+            res = self.testapp.post_json('/api/users/bulk', data,
+                                         headers=headers, status=503)
+
+        self.assertEqual(encode_many.call_count, 2)
+        self.assertEqual(User.count(), count)
+
     def test_read(self):
         # Test unauthenticated/unauthorized access
         headers = {'Accept': 'application/json'}
@@ -325,6 +617,181 @@ class TestAPIUsers(FuncTest):
         self.assertIn('data', res.json)
         self.assertEqual(res.json['data']['email'], 'user@example.com')
 
+        # Test authenticated/authorized access (sparse fieldset)
+        res = self.testapp.get('/api/users/%s?fields=id,email,password' %
+                               self.user_user.id, headers=headers, status=200)
+        self.assertEqual(res.json['data'], {'id': self.user_user.id,
+                                            'email': 'user@example.com'})
+
+        # Test authenticated/authorized access (the profile's user backref
+        # isn't included, so it doesn't recurse)
+        res = self.testapp.get('/api/users/%s?include=profile,user' %
+                               self.user_user.id, headers=headers, status=200)
+        self.assertEqual(res.json['data']['profile']['first_name'], 'User')
+        self.assertNotIn('user', res.json['data']['profile'])
+
+        # Test authenticated/authorized access (conditional GET)
+        res = self.testapp.get('/api/users/%s' % self.user_user.id,
+                               headers=headers, status=200)
+        headers['If-None-Match'] = res.headers['ETag']
+        res = self.testapp.get('/api/users/%s' % self.user_user.id,
+                               headers=headers, status=304)
+        self.assertFalse(res.body)
+
+        # Test authenticated/authorized access (cached document)
+        del headers['If-None-Match']
+        res = self.testapp.get('/api/users/%s' % self.user_user.id,
+                               headers=headers, status=200)
+        key = ('User', self.user_user.id, res.headers['ETag'].strip('"'),
+               'application/json')
+        self.assertEqual(document_cache.get(key), res.body)
+
+        # Updating the user removes their cached documents
+        token = self.admin_user.authorization_token
+        self.testapp.patch_json('/api/users/%s' % self.user_user.id,
+                                {'profile': {'first_name': 'Jane'}},
+                                headers=dict(headers,
+                                             Authorization='Token %s' % token),
+                                status=200)
+        self.assertIsNone(document_cache.get(key))
+
+        # The ETag changes when the user does
+        with transaction.manager:
+            User.partial_update(self.user_user.id, {'role': 'superuser'})
+        res = self.testapp.get('/api/users/%s' % self.user_user.id,
+                               headers=headers, status=200)
+        self.assertEqual(res.json['data']['role'], 'superuser')
+
+        # Test authenticated/authorized access -- invalid user id
+        res = self.testapp.get('/api/users/999', headers=headers, status=404)
+
+    def test_msgpack(self):
+        token = self.admin_user.authorization_token
+        headers = {'Accept': 'application/msgpack',
+                   'Authorization': 'Token %s' % token}
+
+        # Test read
+        res = self.testapp.get('/api/users/%s?include=profile' %
+                               self.user_user.id, headers=headers, status=200)
+        self.assertEqual(res.content_type, 'application/msgpack')
+        self.assertTrue(res.headers['ETag'].endswith('-msgpack"'))
+        self.assertIn('Accept', res.headers['Vary'])
+        data = unpackb(res.body)['data']
+        self.assertEqual(data['email'], 'user@example.com')
+        self.assertEqual(data['profile']['first_name'], 'User')
+
+        # The JSON representation has a different ETag
+        json_res = self.testapp.get(
+            '/api/users/%s?include=profile' % self.user_user.id,
+            headers=dict(headers, Accept='application/json'), status=200
+        )
+        self.assertEqual(json_res.json['data'], data)
+        self.assertNotEqual(json_res.headers['ETag'], res.headers['ETag'])
+        headers['If-None-Match'] = res.headers['ETag']
+        self.testapp.get('/api/users/%s?include=profile' % self.user_user.id,
+                         headers=headers, status=304)
+        del headers['If-None-Match']
+
+        # Test list (JSON remains the default for clients accepting both)
+        res = self.testapp.get('/api/users', headers=headers, status=200)
+        body = unpackb(res.body)
+        self.assertEqual(sorted(user['email'] for user in body['data']),
+                         ['admin@example.com', 'user@example.com'])
+        self.assertEqual(body['meta']['item_count'], 2)
+        res = self.testapp.get('/api/users', status=200, headers=dict(
+            headers, Accept='application/json, application/msgpack;q=0.5'
+        ))
+        self.assertEqual(res.content_type, 'application/json')
+
+        # Test update (MessagePack body)
+        res = self.testapp.patch(
+            '/api/users/%s' % self.user_user.id, packb({'role': 'superuser'}),
+            headers=headers, content_type='application/msgpack', status=200
+        )
+        self.assertEqual(unpackb(res.body)['data']['role'], 'superuser')
+        res = self.testapp.patch(
+            '/api/users/%s' % self.user_user.id, b'\xc1',
+            headers=headers, content_type='application/msgpack', status=400
+        )
+
+        # Test bulk create (MessagePack body)
+        data = [{'email': 'bulk+%s@example.com' % i, 'password': '654321',
+                 'profile': {'first_name': 'Bulk', 'last_name': 'User'}}
+                for i in range(2)]
+        res = self.testapp.post('/api/users/bulk', packb(data),
+                                headers=headers,
+                                content_type='application/msgpack',
+                                status=201)
+        body = unpackb(res.body)
+        self.assertEqual(body['errors'], [None, None])
+        self.assertEqual(body['data'][1]['email'], 'bulk+1@example.com')
+        ids = [user['id'] for user in body['data']]
+
+        # Test bulk update and delete (MessagePack bodies)
+        res = self.testapp.patch('/api/users/bulk',
+                                 packb({'ids': ids,
+                                        'data': {'role': 'superuser'}}),
+                                 headers=headers,
+                                 content_type='application/msgpack',
+                                 status=200)
+        self.assertEqual(unpackb(res.body)['data']['count'], 2)
+        self.testapp.patch('/api/users/bulk', b'\xc1', headers=headers,
+                           content_type='application/msgpack', status=400)
+        res = self.testapp.delete('/api/users/bulk', packb({'ids': ids}),
+                                  headers=headers,
+                                  content_type='application/msgpack',
+                                  status=200)
+        self.assertEqual(unpackb(res.body)['data']['count'], 2)
+
+    def test_replicas(self):
+        # Set up a replica (as a copy of the primary database)
+        settings = get_appsettings('test.ini', 'main')
+        primary = settings['sqlalchemy.url'][len('sqlite:///'):]
+        replica = primary.replace('.sqlite', '_replica.sqlite')
+        shutil.copy(primary, replica)
+        self.addCleanup(os.remove, replica)
+        settings['sqlalchemy.replicas.copy.url'] = 'sqlite:///' + replica
+        testapp = TestApp(main(settings.global_conf, **settings))
+        self.addCleanup(replicas.configure)
+        self.assertEqual(len(replicas.engines), 1)
+
+        # Update the primary only
+        with transaction.manager:
+            User.partial_update(self.user_user.id, {'role': 'superuser'})
+
+        # Test reads are served by the replica
+        token = self.admin_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        url = '/api/users/%s?include=profile' % self.user_user.id
+        res = testapp.get(url, headers=headers, status=200)
+        self.assertEqual(res.json['data']['role'], 'user')
+        self.assertNotIn('starter-primary', testapp.cookies)
+
+        # Test writes (and reads after them) go to the primary
+        res = testapp.patch_json(url, {'profile': {'first_name': 'Jane'}},
+                                 headers=headers, status=200)
+        self.assertEqual(res.json['data']['role'], 'superuser')
+        self.assertEqual(res.json['data']['profile']['first_name'], 'Jane')
+        self.assertIn('starter-primary', testapp.cookies)
+
+        # Test the client's reads stick to the primary after writing
+        res = testapp.get(url, headers=headers, status=200)
+        self.assertEqual(res.json['data']['profile']['first_name'], 'Jane')
+
+        # Test other clients still read from the replica
+        testapp.reset()
+        res = testapp.get(url, headers=headers, status=200)
+        self.assertEqual(res.json['data']['profile']['first_name'], 'User')
+
+        # Test writes only flushed when the transaction commits stick too
+        testapp.reset()
+        form = testapp.get('/users/login.html', status=200).form
+        form['email'] = self.user_user.email
+        form['password'] = '123456'
+        self.assertEqual(form.submit('Login').status_int, 302)
+        self.assertIn('starter-primary', testapp.cookies)
+
     def test_update(self):
         data = {'email': 'test@example.com', 'password': 'secret',
                 'profile': {'first_name': 'John', 'last_name': 'Smith'}}
@@ -403,6 +870,128 @@ class TestAPIUsers(FuncTest):
         self.assertIn('profile', res.json['data'])
         self.assertEqual(res.json['data']['profile']['last_name'], 'Last')
 
+        # Test authenticated/authorized access -- partial data (PATCH)
+        res = self.testapp.patch_json(
+            '/api/users/%s?include=profile' % self.user_user.id,
+            {'role': 'superuser', 'profile': {'first_name': 'Jane'}},
+            headers=headers,
+            status=200
+        )
+        self.assertEqual(res.json['data']['email'], 'test@example.com')
+        self.assertEqual(res.json['data']['role'], 'superuser')
+        self.assertEqual(res.json['data']['profile']['first_name'], 'Jane')
+        self.assertEqual(res.json['data']['profile']['last_name'], 'Last')
+
+        # Test authenticated/authorized access -- partial data, unknown user
+        res = self.testapp.patch_json('/api/users/999', {'role': 'user'},
+                                      headers=headers, status=404)
+
+        # Test authenticated/authorized access -- hashing pool saturated
+        # (nothing is committed)
+        with mock.patch.object(hasher, 'encode',
+                               side_effect=HashingUnavailable()):
+            res = self.testapp.patch_json(
+                '/api/users/%s' % self.user_user.id,
+                {'role': 'user', 'password': 'secret'},
+                headers=headers,
+                status=503
+            )
+        res = self.testapp.get('/api/users/%s' % self.user_user.id,
+                               headers=headers, status=200)
+        self.assertEqual(res.json['data']['role'], 'superuser')
+
+    def test_bulk_update(self):
+        ids = [self.admin_user.id, self.user_user.id]
+        data = {'ids': ids, 'data': {'role': 'superuser',
+                                     'profile': {'first_name': 'Bulk',
+                                                 'last_name': 'Updated'}}}
+
+        # Test authenticated/unauthorized access
+        token = self.user_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.patch_json('/api/users/bulk', data, headers=headers,
+                                      status=403)
+
+        # Test authenticated/authorized access -- invalid data
+        token = self.admin_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.patch_json(
+            '/api/users/bulk',
+            {'ids': 'invalid', 'data': {'role': 'invalid'}},
+            headers=headers,
+            status=422
+        )
+        self.assertEqual(res.json['data'], None)
+        self.assertIn('ids', res.json['errors'])
+        self.assertIn('role', res.json['errors'])
+        res = self.testapp.patch_json(
+            '/api/users/bulk',
+            {'ids': ids, 'data': {'email': 'bulk@example.com'}},
+            headers=headers,
+            status=422
+        )
+        self.assertIn('email', res.json['errors'])
+
+        # Test authenticated/authorized access -- missing data
+        res = self.testapp.patch_json('/api/users/bulk', {'ids': ids},
+                                      headers=headers, status=400)
+
+        # Test authenticated/authorized access -- valid data
+        res = self.testapp.patch_json('/api/users/bulk', data, headers=headers,
+                                      status=200)
+        self.assertEqual(res.json['data']['count'], 2)
+
+        # Re-read the resources to verify update (the admin's token is still
+        # valid, but they're now a superuser)
+        res = self.testapp.get('/api/users/%s?include=profile' %
+                               self.user_user.id, headers=headers, status=200)
+        self.assertEqual(res.json['data']['role'], 'superuser')
+        self.assertEqual(res.json['data']['profile']['last_name'], 'Updated')
+        res = self.testapp.get('/api/users', headers=headers, status=403)
+
+        # Test authenticated/authorized access -- hashing pool saturated
+        # (nothing is committed)
+        with mock.patch.object(hasher, 'encode',
+                               side_effect=HashingUnavailable()):
+            res = self.testapp.patch_json(
+                '/api/users/bulk',
+                {'ids': ids, 'data': {'role': 'user', 'password': 'secret'}},
+                headers=headers,
+                status=503
+            )
+        res = self.testapp.get('/api/users/%s' % self.user_user.id,
+                               headers=headers, status=200)
+        self.assertEqual(res.json['data']['role'], 'superuser')
+
+    def test_bulk_delete(self):
+        # Test authenticated/unauthorized access
+        token = self.user_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.delete('/api/users/bulk?ids=%s' % self.user_user.id,
+                                  headers=headers, status=403)
+
+        # Test authenticated/authorized access -- invalid ids
+        token = self.admin_user.authorization_token
+        headers = {'Accept': 'application/json',
+                   'Authorization': 'Token %s' % token}
+        res = self.testapp.delete('/api/users/bulk?ids=a,b', headers=headers,
+                                  status=422)
+        self.assertIn('ids', res.json['errors'])
+
+        # Test authenticated/authorized access -- valid ids (JSON body)
+        res = self.testapp.delete_json('/api/users/bulk',
+                                       {'ids': [self.user_user.id, 9999]},
+                                       headers=headers, status=200)
+        self.assertEqual(res.json['data']['count'], 1)
+
+        # Re-read the resource to verify delete
+        res = self.testapp.get('/api/users/%s' % self.user_user.id,
+                               headers=headers, status=404)
+        self.assertEqual(UserProfile.count(), 1)
+
     def test_delete(self):
         # Test unauthenticated/unauthorized access
         headers = {'Accept': 'application/json'}
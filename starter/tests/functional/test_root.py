@@ -1,4 +1,11 @@
+import shutil
+from webtest import TestApp
+from webob import Request
+from pyramid.paster import get_appsettings
 from . import FuncTest
+from starter import main
+from starter.lib.assets import build_assets
+from starter.lib.pagecache import page_cache, CSRF_PLACEHOLDER
 
 class TestRoot(FuncTest):
     def test_index(self):
@@ -11,3 +18,120 @@ class TestRoot(FuncTest):
     def test_about(self):
         res = self.testapp.get('/about.html', status=200)
         res.mustcontain('<h1>About</h1>')
+
+    def test_page_cache(self):
+        page_cache.clear()
+        res = self.testapp.get('/', status=200)
+        token = res.form['csrf_token'].value
+        self.assertEqual(len(page_cache), 2)
+
+        # Test anonymous access (cached, with the visitor's own CSRF token)
+        self.testapp.reset()
+        res = self.testapp.get('/', status=200)
+        res.mustcontain('<h1>Pyramid App</h1>')
+        self.assertNotEqual(res.form['csrf_token'].value, token)
+        self.assertNotIn(CSRF_PLACEHOLDER, res.body)
+        self.assertIn('Set-Cookie', res.headers)
+
+        # Test bypass when a flash message is pending
+        res = self.testapp.get('/users/me.html', status=302)
+        res = self.testapp.get('/', status=200)
+        res.mustcontain('Please log in before continuing.')
+
+    def test_static(self):
+        res = self.testapp.get('/static/css/application.css', status=200)
+        res.mustcontain('body')
+        self.assertEqual(res.content_type, 'text/css')
+        self.assertIn('ETag', res.headers)
+
+        # Test conditional and partial requests
+        self.testapp.get('/static/css/application.css', headers={
+            'If-Modified-Since': res.headers['Last-Modified']
+        }, status=304)
+        partial = self.testapp.get('/static/css/application.css', headers={
+            'Range': 'bytes=0-9'
+        }, status=206)
+        self.assertEqual(partial.body, res.body[:10])
+        self.testapp.head('/static/css/application.css', status=200)
+
+        # Test missing (or out of bounds) files
+        self.testapp.get('/static/css/missing.css', status=404)
+        self.testapp.get('/static/css/', status=404)
+        self.testapp.get('/static/../setup.py', status=404)
+
+    def test_compression(self):
+        headers = {'Accept-Encoding': 'gzip'}
+        res = Request.blank('/about.html', headers=headers) \
+                     .get_response(self.testapp.app)
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+        res.decode_content()
+        self.assertIn(b'<h1>About</h1>', res.body)
+
+        # Test clients which don't accept compressed responses
+        res = self.testapp.get('/about.html', status=200)
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+
+        # Test small and already compressed responses
+        res = Request.blank('/api/', headers=dict(
+            headers, Accept='application/json'
+        )).get_response(self.testapp.app)
+        self.assertNotIn('Content-Encoding', res.headers)
+        res = Request.blank('/static/img/pyramid-16x16.png',
+                            headers=headers).get_response(self.testapp.app)
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertNotIn('Vary', res.headers)
+
+        # Test static files are sent as is, rather than compressed
+        res = Request.blank('/static/css/application.css',
+                            headers=headers).get_response(self.testapp.app)
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertIn(b'body', res.body)
+
+    def test_warm_up(self):
+        page_cache.clear()
+        settings = get_appsettings('test.ini', 'main')
+        settings['warmup.requests'] = '/\n/api/ application/json'
+        app = main(settings.global_conf, **settings)
+        self.assertEqual(sorted(app.registry.warmup_timings),
+                         ['connections', 'mappers', 'requests', 'templates',
+                          'total'])
+
+        # Test the warm-up requests (for localhost) weren't cached
+        self.assertEqual(len(page_cache), 0)
+
+    def test_assets(self):
+        settings = get_appsettings('test.ini', 'main')
+        paths = build_assets('starter:static', settings['assets.directory'])
+        self.addCleanup(shutil.rmtree, settings['assets.directory'])
+        css = '/assets/' + paths['css/application.css']
+        png = '/assets/' + paths['img/pyramid-16x16.png']
+
+        # Test the fingerprinted asset URLs
+        page_cache.clear()
+        testapp = TestApp(main(settings.global_conf, **settings))
+        res = testapp.get('/', status=200)
+        res.mustcontain('href="%s"' % css, 'href="%s"' % png)
+
+        # Test compression negotiation (bypassing WebTest, which decodes
+        # responses) and caching
+        req = Request.blank(css, headers={'Accept-Encoding': 'gzip'})
+        res = req.get_response(testapp.app)
+        self.assertEqual(res.status_int, 200)
+        self.assertEqual(res.content_type, 'text/css')
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(res.headers['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', res.headers['Cache-Control'])
+        res.decode_content()
+        body = res.body
+        res = testapp.get(css, status=200)
+        self.assertEqual(res.body, body)
+        res.mustcontain('body')
+        res = testapp.get(png, headers={'Accept-Encoding': 'gzip'}, status=200)
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertNotIn('Vary', res.headers)
+
+        # Test unknown (or unfingerprinted) assets
+        testapp.get('/assets/css/application.css', status=404)
+        testapp.get('/assets/manifest.json', status=404)
+        testapp.get('/static/css/application.css', status=200)
@@ -7,6 +7,7 @@ from pyramid_mailer import get_mailer
 import transaction
 from . import FuncTest
 from starter.models import *
+from starter.lib.pagecache import page_cache
 
 class TestUsers(FuncTest):
     def setUp(self):
@@ -262,3 +263,32 @@ class TestUsers(FuncTest):
             'Your password was successfully changed.',
             res.pyquery('#flash-message').text()
         )
+
+    def test_me(self):
+        page_cache.clear()
+
+        # Login as admin
+        res = self.testapp.get(
+            '/users/login.html?email=admin@example.com&password=123456',
+            status=302
+        )
+        res = self.testapp.get('/users/me.html', status=200)
+        res.mustcontain('<h1>Admin User</h1>', 'admin@example.com',
+                        'Admin</a>')
+        # Check that the page shell was cached
+        self.assertEqual(len(page_cache), 2)
+
+        # Login as user (served from the same shell)
+        self.testapp.reset()
+        res = self.testapp.get(
+            '/users/login.html?email=user@example.com&password=123456',
+            status=302
+        )
+        res = self.testapp.get('/users/me.html', status=200)
+        res.mustcontain('<h1>User User</h1>', 'user@example.com',
+                        no=['admin@example.com', 'Admin</a>'])
+        self.assertEqual(len(page_cache), 2)
+
+        # Logout (the shell still requires authorization)
+        res = self.testapp.get('/users/logout.html', status=302)
+        res = self.testapp.get('/users/me.html', status=302)
@@ -5,6 +5,9 @@ from unittest import TestCase
 # 3rd Party imports
 from sqlalchemy.orm.exc import NoResultFound
 
+# Pyramid imports
+from pyramid.testing import DummyRequest
+
 # Project imports
 from starter.models import *
 from starter.models.seeds import *
@@ -65,6 +68,10 @@ class TestUser(TestCase):
 
         # User.count()
         self.assertEqual(User.count(), 2)
+        self.assertEqual(User.count(User.role == 'admin'), 1)
+        count_cache.clear()
+        self.assertEqual(User.count(User.role == 'admin', cache=True), 1)
+        self.assertEqual(User.count(User.role == 'user', cache=True), 1)
 
         # User.filter()
         self.assertEqual(User.filter(User.email == 'admin@example.com').one(),
@@ -108,3 +115,53 @@ class TestUser(TestCase):
 
         # __init__
         self.assertEqual(int(self.admin_user), self.admin_user.id)
+
+    def test_json(self):
+        fields = list(UserJSON.Meta.fields)
+
+        # __json__
+        data = self.user_user.__json__(DummyRequest())
+        self.assertEqual(data['email'], 'user@example.com')
+        self.assertNotIn('password', data)
+        self.assertNotIn('profile', data)
+
+        data = self.user_user.__json__(DummyRequest(params={'include':
+                                                            'profile'}))
+        self.assertEqual(data['profile'], self.user_user.profile)
+
+        data = self.user_user.__json__(DummyRequest(params={'fields':
+                                                            'id,password'}))
+        self.assertEqual(data, {'id': self.user_user.id})
+
+        # Schema options should never be modified
+        self.assertEqual(UserJSON.Meta.fields, fields)
+
+        # json_serializer
+        self.assertIs(User.json_serializer(), User.json_serializer())
+        self.assertIsNot(User.json_serializer(include='profile'),
+                         User.json_serializer())
+
+        # json_loader_options
+        self.assertEqual(User.json_loader_options(), [])
+        self.assertEqual(len(User.json_loader_options(include='profile')), 1)
+        # (a root load_only plus the profile's eager load)
+        self.assertEqual(len(User.json_loader_options('id,profile')), 2)
+        user = User.json_query(DummyRequest(params={'include': 'profile'})) \
+                   .filter(User.id == self.user_user.id) \
+                   .one()
+        self.assertIn('profile', user.__dict__)
+
+        # json_load_columns
+        self.assertEqual(User.json_load_columns(), None)
+        self.assertEqual(User.json_load_columns('email'), ['id', '_email'])
+        self.assertEqual(User.json_load_columns('email,password'),
+                         ['id', '_email'])
+        self.assertEqual(User.json_load_columns('role,profile'),
+                         ['id', 'role'])
+        user = User.json_query(DummyRequest(params={'fields': 'id,email'})) \
+                   .filter(User.id == self.admin_user.id) \
+                   .one()
+        self.assertEqual(user.__json__(DummyRequest(params={'fields':
+                                                            'id,email'})),
+                         {'id': self.admin_user.id,
+                          'email': 'admin@example.com'})
@@ -0,0 +1,48 @@
+import os
+import gzip
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+from starter.lib.assets import *
+
+
+class AssetsUnitTest(TestCase):
+    """Tests for the asset pipeline in the assets lib."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_build_assets(self):
+        paths = build_assets('starter:static', self.directory)
+        css = paths['css/application.css']
+        self.assertRegexpMatches(css, r'^css/application\.[0-9a-f]{12}\.css$')
+        self.assertTrue(paths['img/pyramid-16x16.png'].endswith('.png'))
+
+        # Test the copies (and compressed variants)
+        with open(os.path.join(self.directory, css), 'rb') as f:
+            content = f.read()
+        with gzip.open(os.path.join(self.directory, css + '.gz')) as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, paths['img/pyramid-16x16.png'] + '.gz')
+        ))
+
+        # Test the manifest
+        with open(os.path.join(self.directory, 'manifest.json')) as f:
+            self.assertEqual(json.load(f), paths)
+
+        # Test rebuilds are reproducible
+        self.assertEqual(build_assets('starter:static', self.directory), paths)
+
+    def test_manifest(self):
+        manifest = AssetManifest(directory=self.directory)
+        self.assertIsNone(manifest.lookup('starter:static/css/application.css'))
+
+        paths = build_assets('starter:static', self.directory)
+        manifest.configure(directory=self.directory)
+        self.assertEqual(manifest.lookup('starter:static/css/application.css'),
+                         paths['css/application.css'])
+        self.assertIsNone(manifest.lookup('starter:static/css/missing.css'))
+        self.assertIsNone(manifest.lookup('other:static/css/application.css'))
@@ -0,0 +1,60 @@
+import time
+from unittest import TestCase
+from starter.lib.cache import Cache
+
+
+class CacheUnitTest(TestCase):
+    """Tests for the Cache class in the cache lib."""
+
+    def test_get_set(self):
+        cache = Cache()
+        cache.set('key', 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertIn('key', cache)
+        self.assertEqual(cache.get('missing'), None)
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+
+    def test_max_size(self):
+        cache = Cache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # Touch "a" so that "b" becomes the least recently used entry
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_ttl(self):
+        cache = Cache(ttl=60)
+        cache.set('key', 'value')
+        cache.set('expired', 'value', ttl=0.01)
+        time.sleep(0.02)
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get('expired'), None)
+
+    def test_delete(self):
+        cache = Cache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        cache.delete('a')
+        self.assertNotIn('a', cache)
+        cache.delete_where(lambda key, value: value > 2)
+        self.assertNotIn('c', cache)
+        self.assertIn('b', cache)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_fetch(self):
+        cache = Cache(ttl=0.05, stale_ttl=60)
+        values = iter(range(3))
+        creator = lambda: next(values)
+        self.assertEqual(cache.fetch('key', creator), 0)
+        self.assertEqual(cache.fetch('key', creator), 0)
+        # Stale values are served while being recreated in the background
+        time.sleep(0.06)
+        self.assertEqual(cache.fetch('key', creator), 0)
+        time.sleep(0.01)
+        self.assertEqual(cache.fetch('key', creator), 1)
@@ -0,0 +1,72 @@
+import os
+import threading
+from unittest import TestCase
+from starter.lib.hashing import *
+
+
+class HashingUnitTest(TestCase):
+    """Tests for the PasswordHasher class in the hashing lib."""
+
+    def test_encode_check(self):
+        for executor in ('inline', 'thread', 'process'):
+            hasher = PasswordHasher(executor, max_workers=1)
+            encoded = hasher.encode('123456')
+            self.assertNotEqual(encoded, '123456')
+            self.assertTrue(hasher.check(encoded, '123456'),
+                            'Valid password check failed (%s)' % executor)
+            self.assertFalse(hasher.check(encoded, '654321'),
+                             'Invalid password check failed (%s)' % executor)
+
+    def test_encode_many(self):
+        for executor in ('inline', 'thread', 'process'):
+            hasher = PasswordHasher(executor, max_workers=2, max_pending=2)
+            encoded = hasher.encode_many(['123456', '654321', 'abcdef'])
+            self.assertEqual(len(encoded), 3)
+            self.assertTrue(hasher.check(encoded[0], '123456'))
+            self.assertTrue(hasher.check(encoded[1], '654321'))
+            self.assertTrue(hasher.check(encoded[2], 'abcdef'))
+
+    def test_saturated(self):
+        hasher = PasswordHasher('thread', max_workers=1, max_pending=1,
+                                timeout=0.01)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        thread = threading.Thread(target=hasher.run, args=(block,))
+        thread.start()
+        started.wait()
+
+        with self.assertRaises(HashingUnavailable):
+            hasher.encode('123456')
+
+        release.set()
+        thread.join()
+        self.assertTrue(hasher.check(hasher.encode('123456'), '123456'))
+
+    def test_result_timeout(self):
+        hasher = PasswordHasher('thread', max_workers=1, max_pending=1,
+                                timeout=0.01, result_timeout=0.01)
+        release = threading.Event()
+
+        with self.assertRaises(HashingUnavailable):
+            hasher.run(release.wait)
+
+        # The hung job keeps its slot until it completes
+        with self.assertRaises(HashingUnavailable):
+            hasher.encode('123456')
+
+        release.set()
+        hasher.timeout = hasher.result_timeout = 5
+        self.assertTrue(hasher.check(hasher.encode('123456'), '123456'))
+
+    def test_broken(self):
+        hasher = PasswordHasher('process', max_workers=1)
+
+        # A crashed worker breaks the pool, which is then replaced
+        with self.assertRaises(HashingUnavailable):
+            hasher.run(os._exit, 1)
+
+        self.assertTrue(hasher.check(hasher.encode('123456'), '123456'))
@@ -0,0 +1,47 @@
+import struct
+from unittest import TestCase
+from starter.lib.packing import *
+
+
+class PackingUnitTest(TestCase):
+    """Tests for the packb and unpackb functions in the packing lib."""
+
+    def test_round_trip(self):
+        values = [
+            None, True, False, 0, 1, 127, 128, 255, 256, 65535, 65536,
+            2 ** 32, 2 ** 64 - 1, -1, -32, -33, -128, -129, -32768, -32769,
+            -2 ** 31 - 1, -2 ** 63, 1.5, -0.25, '', u'J\xf6hn', 'a' * 31,
+            'a' * 32, 'a' * 255, 'a' * 256, 'a' * 65536, b'', b'\x00' * 300,
+            [], list(range(15)), list(range(16)), list(range(70000)), {},
+            {'key': [1, {'nested': None}]},
+            dict(('k%d' % i, i) for i in range(16)),
+        ]
+
+        for value in values:
+            self.assertEqual(unpackb(packb(value)), value,
+                             'Round trip failed (%r)' % (value,)[:40])
+
+        self.assertEqual(unpackb(packb((1, 2))), [1, 2])
+
+    def test_encoding(self):
+        # Values are encoded in their most compact form
+        self.assertEqual(packb(None), b'\xc0')
+        self.assertEqual(packb(5), b'\x05')
+        self.assertEqual(packb(-1), b'\xff')
+        self.assertEqual(packb(200), b'\xcc\xc8')
+        self.assertEqual(packb('abc'), b'\xa3abc')
+        self.assertEqual(packb({'a': [1]}), b'\x81\xa1a\x91\x01')
+        # Single precision floats are decoded too
+        self.assertEqual(unpackb(b'\xca' + struct.pack('>f', 1.5)), 1.5)
+
+        with self.assertRaises(TypeError):
+            packb(object())
+
+        with self.assertRaises(TypeError):
+            packb(2 ** 64)
+
+    def test_malformed(self):
+        for data in (b'', b'\xc1', b'\xa3ab', b'\x92\x01', b'\xcd\x01',
+                     b'\x01\x02', b'\xa1\xff', b'\x81\x90\x01'):
+            with self.assertRaises(ValueError):
+                unpackb(data)
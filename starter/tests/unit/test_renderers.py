@@ -0,0 +1,95 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+from unittest import TestCase, mock
+from pyramid.renderers import JSON
+from pyramid.testing import DummyRequest
+from webob.acceptparse import create_accept_header
+from starter.lib.packing import unpackb
+from starter.lib.renderers import *
+from starter.models import User, UserProfile
+
+
+class RenderersUnitTest(TestCase):
+    """Tests for the JSONRenderer class in the renderers lib."""
+
+    def setUp(self):
+        self.users = []
+
+        for id in (1, 2):
+            user = User(email='user+%d@example.com' % id, role='user',
+                        profile=UserProfile(first_name=u'J\xf6hn',
+                                            last_name='Smith'))
+            user.id = id
+            user.created = user.updated = datetime(2016, 3, 4, 15, 1, 3, 5)
+            user.last_login = None
+            self.users.append(user)
+
+    def test_models(self):
+        for params in ({}, {'fields': 'id,email'}, {'include': 'profile'},
+                       {'fields': 'id,password,profile'}):
+            request = DummyRequest(params=params)
+            value = dict(data=self.users, meta=dict(page=1), errors=None)
+            expected = JSON()(None)(
+                dict(value, data=[user.__json__(request)
+                                  for user in self.users]),
+                dict(request=request)
+            )
+            rendered = JSONRenderer()(None)(value, dict(request=request))
+            self.assertEqual(json.loads(rendered), json.loads(expected),
+                             'Rendering failed (%s)' % params)
+            self.assertNotIn(' ', rendered)
+            self.assertEqual(request.response.content_type,
+                             'application/json')
+
+        profile = self.users[0].profile
+        self.assertEqual(json.loads(encode_json(profile, DummyRequest())),
+                         profile.__json__(DummyRequest()))
+
+        # Test each model's plan is looked up once per encoder
+        for encoder in (JSONEncoder(DummyRequest()),
+                        MsgpackEncoder(DummyRequest())):
+            with mock.patch.object(plan_cache, 'get',
+                                   wraps=plan_cache.get) as get:
+                encoder.encode(self.users * 50)
+            self.assertEqual(get.call_count, 1)
+
+    def test_values(self):
+        value = {'str': u'☃"', 'int': 1, 'float': 1.5, 'bool': True,
+                 'none': None, 'list': [1, (2, 3)], 1: 'key'}
+        self.assertEqual(json.loads(encode_json(value)),
+                         json.loads(json.dumps(value)))
+        self.assertEqual(encode_json(float('nan')), 'NaN')
+        self.assertEqual(encode_json(datetime(2016, 3, 4)),
+                         '"2016-03-04T00:00:00+00:00"')
+        tzinfo = timezone(timedelta(hours=1))
+        self.assertEqual(encode_json(datetime(2016, 3, 4, tzinfo=tzinfo)),
+                         '"2016-03-03T23:00:00+00:00"')
+        self.assertEqual(encode_json(date(2016, 3, 4)), '"2016-03-04"')
+
+        with self.assertRaises(TypeError):
+            encode_json(object())
+
+    def test_msgpack(self):
+        for params in ({}, {'fields': 'id,email'}, {'include': 'profile'}):
+            request = DummyRequest(params=params)
+            request.accept = create_accept_header('application/msgpack')
+            value = dict(data=self.users, meta=dict(page=1), errors=None)
+            expected = encode_json(value, DummyRequest(params=params))
+            rendered = JSONRenderer()(None)(value, dict(request=request))
+            self.assertEqual(unpackb(rendered), json.loads(expected),
+                             'Rendering failed (%s)' % params)
+            self.assertEqual(request.response.content_type,
+                             'application/msgpack')
+
+        self.assertEqual(media_type(DummyRequest()), 'application/json')
+
+        for header, expected in ((None, 'application/json'),
+                                 ('*/*', 'application/json'),
+                                 ('application/x-msgpack',
+                                  'application/msgpack')):
+            request = DummyRequest()
+            request.accept = create_accept_header(header)
+            self.assertEqual(media_type(request), expected)
+        self.assertEqual(unpackb(MsgpackEncoder().encode(
+            {1: datetime(2016, 3, 4), 'date': date(2016, 3, 4)}
+        )), {'1': '2016-03-04T00:00:00+00:00', 'date': '2016-03-04'})
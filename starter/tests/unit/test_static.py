@@ -0,0 +1,83 @@
+import os
+import gzip
+import shutil
+import tempfile
+from unittest import TestCase
+from pyramid.request import Request
+from starter.lib.static import *
+
+
+class StaticUnitTest(TestCase):
+    """Tests for the StaticFiles class in the static lib."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'file.txt')
+        with open(self.path, 'wb') as f:
+            f.write(b'0123456789' * 100)
+
+    def get(self, files, **headers):
+        request = Request.blank('/', headers=headers)
+        return request.get_response(
+            lambda environ, start_response: files.response(
+                self.path, request, cache_max_age=60
+            )(environ, start_response)
+        )
+
+    def test_mmap(self):
+        files = StaticFiles(max_file_size=1000)
+        res = self.get(files)
+        self.assertEqual(res.body, b'0123456789' * 100)
+        self.assertEqual(res.content_type, 'text/plain')
+        self.assertEqual(len(files.cache), 1)
+        self.assertEqual(self.get(files, Range='bytes=5-14').body,
+                         b'5678901234')
+
+        # Test the mapping is replaced when the file changes
+        with open(self.path, 'wb') as f:
+            f.write(b'abc')
+        os.utime(self.path, (0, 0))
+        self.assertEqual(self.get(files).body, b'abc')
+
+    def test_stream(self):
+        files = StaticFiles(max_file_size=10)
+        res = self.get(files)
+        self.assertEqual(res.body, b'0123456789' * 100)
+        self.assertEqual(len(files.cache), 0)
+
+        res = self.get(files, Range='bytes=995-')
+        self.assertEqual(res.status_int, 206)
+        self.assertEqual(res.body, b'56789')
+        self.assertEqual(res.headers['Content-Range'], 'bytes 995-999/1000')
+        self.assertEqual(self.get(files, Range='bytes=2000-').status_int, 416)
+
+    def test_conditional(self):
+        files = StaticFiles()
+        res = self.get(files)
+        self.assertEqual(self.get(
+            files, **{'If-Modified-Since': res.headers['Last-Modified']}
+        ).status_int, 304)
+        self.assertEqual(self.get(
+            files, **{'If-None-Match': res.headers['ETag']}
+        ).status_int, 304)
+
+    def test_negotiate(self):
+        files = StaticFiles()
+        request = Request.blank('/', headers={'Accept-Encoding': 'gzip'})
+        res = files.negotiate(self.path, request)
+        self.assertEqual(res.body, b'0123456789' * 100)
+        self.assertIsNone(res.vary)
+
+        # Test the precompressed variant is served to clients accepting it
+        with gzip.open(self.path + '.gz', 'wb') as f:
+            f.write(b'0123456789' * 100)
+        res = files.negotiate(self.path, request)
+        self.assertEqual(res.content_encoding, 'gzip')
+        self.assertEqual(res.content_type, 'text/plain')
+        self.assertEqual(res.vary, ('Accept-Encoding',))
+        self.assertEqual(gzip.decompress(res.body), b'0123456789' * 100)
+        res = files.negotiate(self.path, Request.blank('/'))
+        self.assertIsNone(res.content_encoding)
+        self.assertEqual(res.body, b'0123456789' * 100)
+        self.assertEqual(res.vary, ('Accept-Encoding',))
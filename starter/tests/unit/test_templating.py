@@ -0,0 +1,61 @@
+import os
+import time
+import shutil
+import tempfile
+from unittest import TestCase
+from jinja2 import Environment, DictLoader, FileSystemLoader
+from jinja2.bccache import FileSystemBytecodeCache
+from starter.lib.templating import CacheExtension, precompile_templates
+
+
+class TemplatingUnitTest(TestCase):
+    """Tests for the Jinja2 extensions in the templating lib."""
+
+    def setUp(self):
+        self.env = Environment(
+            loader=DictLoader({
+                'cached.jinja2': '{% cache key %}{{ value }}{% endcache %}',
+                'ttl.jinja2':
+                    '{% cache "key", 0.01 %}{{ value }}{% endcache %}',
+                'escaped.jinja2': '{% cache "key" %}{{ value }}{% endcache %}'
+            }),
+            extensions=[CacheExtension]
+        )
+        self.env.fragment_cache.clear()
+
+    def test_cache(self):
+        template = self.env.get_template('cached.jinja2')
+        self.assertEqual(template.render(key='a', value=1), '1')
+        self.assertEqual(template.render(key='a', value=2), '1')
+        self.assertEqual(template.render(key='b', value=3), '3')
+
+    def test_ttl(self):
+        template = self.env.get_template('ttl.jinja2')
+        self.assertEqual(template.render(value=1), '1')
+        time.sleep(0.02)
+        self.assertEqual(template.render(value=2), '2')
+
+    def test_autoescape(self):
+        self.env.autoescape = True
+        template = self.env.get_template('escaped.jinja2')
+        self.assertEqual(template.render(value='<b>'), '&lt;b&gt;')
+        self.assertEqual(template.render(value='<i>'), '&lt;b&gt;')
+
+    def test_precompile_templates(self):
+        templates = tempfile.mkdtemp()
+        bytecode = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, templates)
+        self.addCleanup(shutil.rmtree, bytecode)
+        os.mkdir(os.path.join(templates, 'users'))
+
+        for name in ('index.jinja2', 'users/me.jinja2', 'notes.txt'):
+            with open(os.path.join(templates, name), 'w') as f:
+                f.write('{{ value }}')
+
+        env = Environment(loader=FileSystemLoader([templates, templates]),
+                          bytecode_cache=FileSystemBytecodeCache(bytecode))
+        names = precompile_templates(env)
+        self.assertEqual(sorted(names), ['index.jinja2', 'users/me.jinja2'])
+        self.assertEqual(len(os.listdir(bytecode)), 2)
+        self.assertEqual(env.get_template('users/me.jinja2').render(value=1),
+                         '1')
@@ -7,8 +7,8 @@ from pyramid.httpexceptions import HTTPNotFound, HTTPFound
 from ..lib.auth import __acl__
 
 
-__all__ = ['View', 'forbidden', 'Root', 'Users', 'AdminRoot', 'APIRoot',
-           'APIUsers']
+__all__ = ['View', 'forbidden', 'service_unavailable', 'Root', 'Users',
+           'AdminRoot', 'APIRoot', 'APIUsers']
 
 class View(object):
     """
@@ -59,6 +59,29 @@ def forbidden(request):
                                         _query=dict(next=next))
         )
 
+def service_unavailable(exc, request):
+    """
+    The ``service unavailable`` exception view.
+
+    Rendered when a request can't be processed because a shared resource (e.g.
+    the password hashing pool) is saturated. Clients are asked to retry
+    shortly.
+    """
+    # If accepting JSON, respond with a JSON error object
+    if 'application/json' in str(request.accept):
+        response = Response(content_type='application/json', charset='utf-8')
+        # This is a publicly accessible API
+        response.headers.update({'Access-Control-Allow-Origin': '*'})
+        response.json_body = dict(data=None, errors=dict(_global=str(exc)))
+    else:
+        response = Response(str(exc), content_type='text/plain',
+                            charset='utf-8')
+
+    response.status = '503 Service Unavailable'
+    response.headers.update({'Retry-After': '1'})
+
+    return response
+
 
 # Load view classes
 from .root import Root
@@ -1,6 +1,8 @@
 """
 Each API call requires the ``Accept`` HTTP header to be set to
-``application/json``.
+``application/json``, or to ``application/msgpack`` for responses encoded as
+`MessagePack <http://msgpack.org/>`_ rather than JSON (request bodies may be
+sent as MessagePack too, with a ``Content-Type: application/msgpack`` header).
 
 User authentication is achieved by sending an "``Authorization: Token ...``"
 HTTP header with the request.
@@ -19,11 +21,20 @@ an error was encountered, in which case it will contain the error message(s).
 .. note:: Example requests are shown using `HTTPie <http://httpie.org>`_ (a
           user-friendly cURL replacement).
 """
+# System imports
+import json
+
 # Pyramid imports
+from pyramid.httpexceptions import (HTTPBadRequest, HTTPNotModified,
+                                    HTTPRequestEntityTooLarge)
+from pyramid.renderers import render
 from pyramid_handlers import action
 
 # Project imports
 from starter.lib.auth import __acl__
+from starter.lib.packing import MEDIA_TYPES as MSGPACK_TYPES, unpackb
+from starter.lib.renderers import media_type
+from starter.models import DBSession, document_cache
 from starter.views import View
 
 # Define the master APIView class
@@ -37,6 +48,12 @@ class APIView(View):
 
         # Paginate 100 items on API requests
         self.items_per_page = 100
+        # Accept up to 10,000 items on bulk requests
+        self.max_bulk_items = 10000
+
+        # Read-only requests read from a replica (if any)
+        if request.method in ('GET', 'HEAD'):
+            DBSession().use_replica()
 
         # This is a publicly accessible API
         request.response.headers.update({
@@ -63,3 +80,114 @@ class APIView(View):
         })
 
         return request.response
+
+    def _body(self):
+        """
+        Parse the request body as MessagePack (if its ``Content-Type`` is
+        ``application/msgpack``) or as JSON, raising a ``400 Bad Request`` if
+        it's malformed.
+        """
+        # Initialize request variables
+        request = self.request
+
+        try:
+            if request.content_type in MSGPACK_TYPES:
+                return unpackb(request.body)
+
+            return request.json_body
+        except ValueError:
+            raise HTTPBadRequest
+
+    def _bulk_params(self):
+        """
+        Parse the items submitted to a bulk action, either as a JSON (or
+        MessagePack) array or as newline delimited JSON
+        (``Content-Type: application/x-ndjson``).
+        """
+        # Initialize request variables
+        request = self.request
+
+        if request.content_type == 'application/x-ndjson':
+            try:
+                items = [json.loads(line) for line in request.text.splitlines()
+                         if line.strip()]
+            except ValueError:
+                raise HTTPBadRequest
+        else:
+            items = self._body()
+
+        if not isinstance(items, list):
+            raise HTTPBadRequest
+        elif len(items) > self.max_bulk_items:
+            raise HTTPRequestEntityTooLarge
+
+        return items
+
+    def _bulk_ids(self, ids):
+        """
+        Validate a list of ``ids`` submitted to a bulk action, returning None
+        if it isn't a (non-empty) list of integers.
+        """
+        if not isinstance(ids, list) or not ids or \
+           not all(isinstance(id, int) for id in ids):
+            return None
+        elif len(ids) > self.max_bulk_items:
+            raise HTTPRequestEntityTooLarge
+
+        return ids
+
+    def _conditional(self, etag):
+        """
+        Set the response's ``ETag`` header, answering with a
+        ``304 Not Modified`` if ``etag`` matches the request's
+        ``If-None-Match`` header.
+
+        As documents are encoded as JSON or MessagePack depending on the
+        request's ``Accept`` header, MessagePack ETags get a ``-msgpack``
+        suffix (and responses vary on ``Accept``).
+        """
+        # Initialize request variables
+        request = self.request
+
+        if media_type(request) in MSGPACK_TYPES:
+            etag += '-msgpack'
+
+        request.response.etag = etag
+        request.response.vary = ('Accept',)
+
+        if etag in request.if_none_match:
+            raise HTTPNotModified(headers={
+                'ETag': request.response.headers['ETag'],
+                'Vary': 'Accept',
+                'Access-Control-Allow-Origin': '*'
+            })
+
+    def _json_document(self, key, value):
+        """
+        Return a JSON (or MessagePack) response for the document identified
+        by ``key`` (which must change whenever the document does, e.g. by
+        including its ETag).
+
+        The encoded document is served from ``document_cache`` if possible,
+        otherwise the result of calling ``value()`` is rendered and cached.
+        """
+        # Initialize request variables
+        request = self.request
+        response = request.response
+
+        content_type = media_type(request)
+        key = tuple(key) + (content_type,)
+        body = document_cache.get(key)
+
+        if body is None:
+            body = render('json', value(), request=request)
+
+            if not isinstance(body, bytes):
+                body = body.encode('utf-8')
+
+            document_cache.set(key, body)
+
+        response.content_type = content_type
+        response.body = body
+
+        return response
@@ -40,6 +40,9 @@ class APIRoot(APIView):
         """
         Show information about the current user.
 
+        Responses carry an ``ETag`` header, and requests with a matching
+        ``If-None-Match`` header are answered with a ``304 Not Modified``.
+
         :returns: A JSON object containing:
 
             :data: A ``User`` object reflecting the current user (or ``null``
@@ -68,4 +71,16 @@ class APIRoot(APIView):
                 }
             }
         """
-        return dict(data=self.request.current_user)
+        # Initialize request variables
+        request = self.request
+        user = request.current_user
+
+        if user is None:
+            return dict(data=user)
+
+        etag = User.etag(user.id, request.GET.get('fields', ''),
+                         request.GET.get('include', ''))
+        self._conditional(etag)
+
+        return self._json_document((User.__name__, user.id, etag),
+                                   lambda: dict(data=user))
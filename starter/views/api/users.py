@@ -21,9 +21,14 @@ from pyramid_mailer.message import Message
 
 # Project imports
 from . import APIView
-from starter.models import DBSession, NoResultFound, User, UserProfile
+from starter.models import (DBSession, NoResultFound, IntegrityError, User,
+                            UserProfile)
+from starter.lib.hashing import HashingUnavailable
 from starter.lib.helpers import generate_secret
-from starter.lib.validation import (validate, Int, Email, UnicodeString,
+from starter.lib.pagination import KeysetPage
+from starter.lib.streaming import stream_json
+from starter.lib.validation import (validate, Invalid, Int, Email,
+                                    UnicodeString, OneOf,
                                     UserCreateSchema, UserUpdateSchema,
                                     UserRegisterForm, UserResetPasswordForm)
 
@@ -36,12 +41,33 @@ class APIUsers(APIView):
     Responsible for JSON requests to the ``/api/users/`` routes.
     """
     @action(renderer='json', permission='admin_permissions')
-    @validate(validators=dict(page=Int(min=1)), methods=['GET'])
+    @validate(validators=dict(page=Int(min=1),
+                              after=UnicodeString(),
+                              limit=Int(min=1, max=1000),
+                              sort=OneOf(('id', 'email', 'created')),
+                              count=OneOf(('exact', 'estimate', 'none')),
+                              stream=OneOf(('json', 'ndjson'))),
+              methods=['GET'])
     def index(self):
         """
         List all users.
 
         :param int page: The page number to load (e.g. ``/api/users/?page=2``).
+        :param str after: Switches to "cursor" pagination. Pass an empty value
+                          for the first page (e.g. ``/api/users/?after=``), then
+                          the previous page's ``meta.next`` cursor to continue.
+                          Cursor pages don't include counts, and cost the same
+                          no matter how deep into the table they are.
+        :param int limit: The number of items per cursor page (max: 1000).
+        :param str sort: The column to order cursor pages by (``id``,
+                         ``email``, or ``created``--defaults to ``id``).
+        :param str count: How ``item_count``/``page_count`` are computed for
+                          page mode: ``exact`` (default), ``estimate`` (a
+                          cached, possibly slightly stale count), or ``none``
+                          (no count, both are ``null``).
+        :param str stream: Stream every user (as :py:meth:`export` does) as a
+                           ``json`` array or as ``ndjson`` instead of returning
+                           a page.
 
         :returns: A JSON object containing:
 
@@ -94,14 +120,59 @@ class APIUsers(APIView):
         # Initialize request variables
         request = self.request
         params = self.validation_results
+        errors = self.validation_errors
 
         meta = {}
 
+        # Streaming mode
+        if params.get('stream'):
+            return stream_json(request, User,
+                               ndjson=(params['stream'] == 'ndjson'))
+
+        # Cursor (keyset) pagination
+        if 'after' in request.GET:
+            if set(errors) & set(['after', 'limit', 'sort']):
+                raise HTTPBadRequest
+
+            sort = params.get('sort') or 'id'
+
+            try:
+                page = KeysetPage(User.json_query(request),
+                                  sort_column=User.__table__.c[sort],
+                                  key_column=User.__table__.c.id,
+                                  after=params.get('after'),
+                                  items_per_page=params.get('limit') or \
+                                                 self.items_per_page)
+            except ValueError:
+                raise HTTPBadRequest
+
+            meta.update(after=page.after, next=page.next, sort=sort,
+                        items_per_page=page.items_per_page)
+
+            return dict(data=page.items, meta=meta)
+
+        count = params.get('count') or 'exact'
+
+        # Skip counting altogether
+        if count == 'none':
+            number = params.get('page') or 1
+            items = User.json_query(request) \
+                        .offset((number - 1) * self.items_per_page) \
+                        .limit(self.items_per_page) \
+                        .all()
+
+            meta.update(page=number, page_count=None, item_count=None,
+                        items_per_page=self.items_per_page)
+
+            return dict(data=items, meta=meta)
+
         # Initialize pager
-        page = SqlalchemyOrmPage(User.query,
+        page = SqlalchemyOrmPage(User.json_query(request),
                                  page=params.get('page', 1),
                                  items_per_page=self.items_per_page,
-                                 item_count=User.count())
+                                 item_count=User.count(
+                                     cache=(count == 'estimate')
+                                 ))
 
         # Build "meta" object
         for key in ['page', 'page_count', 'item_count', 'items_per_page']:
@@ -109,6 +180,33 @@ class APIUsers(APIView):
 
         return dict(data=page.items, meta=meta)
 
+    @action(permission='admin_permissions')
+    def export(self):
+        """
+        Export all users.
+
+        The response body is streamed as users are read from the database, so
+        it can be used to retrieve any number of users. Use the ``.ndjson``
+        extension for newline delimited JSON (one user per line) rather than a
+        JSON array.
+
+        :returns: A JSON array of ``User`` objects.
+
+        Example request::
+
+            http -j :/api/users/export.ndjson Authorization:"Token ..."
+
+        Example response::
+
+            {"email":"user@example.com","id":1,"role":"user",...}
+            {"email":"superuser@example.com","id":2,"role":"superuser",...}
+        """
+        # Initialize request variables
+        request = self.request
+        ndjson = request.matchdict.get('_') == '.ndjson'
+
+        return stream_json(request, User, ndjson=ndjson)
+
     @action(renderer='json', permission='superuser_permissions')
     @validate(UserCreateSchema, allow_json=True)
     def create(self):
@@ -178,11 +276,121 @@ class APIUsers(APIView):
 
         return dict(data=user, errors=errors)
 
+    @action(renderer='json', permission='superuser_permissions')
+    def bulk_create(self):
+        """
+        Create users in bulk.
+
+        Accepts a JSON array (or newline delimited JSON, with a
+        ``Content-Type`` of ``application/x-ndjson``) of up to 10,000 users,
+        each validated as it would be by :py:meth:`create`. Valid users are
+        inserted in batches, and invalid ones are skipped.
+
+        :returns: A JSON object containing:
+
+            :data:   A list with an object reflecting each created user (or
+                     ``null`` if it wasn't created), in the submitted order.
+            :errors: A list with ``null`` for each created user, otherwise an
+                     object containing the error message(s).
+
+        Example request::
+
+            http -j POST :/api/users/bulk Authorization:"Token ..." < users.json
+
+        Example response:
+
+        .. code-block:: json
+
+            {
+                "data": [
+                    {
+                        "email": "email@example.com",
+                        "id": 1
+                    },
+                    null
+                ],
+                "errors": [
+                    null,
+                    {
+                        "email": "Email address must be unique"
+                    }
+                ]
+            }
+        """
+        # Initialize request variables
+        request = self.request
+        items = self._bulk_params()
+
+        data = [None] * len(items)
+        errors = [None] * len(items)
+        values = []
+
+        # Validate each item
+        for index, item in enumerate(items):
+            try:
+                value = UserCreateSchema.to_python(item)
+            except Invalid as err:
+                errors[index] = err.unpack_errors()
+            else:
+                values.append((index, value))
+
+        # Check for duplicate email addresses (both submitted and existing)
+        emails = [value['email'].lower() for index, value in values]
+        existing = set()
+
+        for start in range(0, len(emails), 500):
+            existing.update(
+                email for (email,) in DBSession.query(User._email).filter(
+                    User._email.in_(emails[start:start + 500])
+                )
+            )
+
+        unique = []
+
+        for (index, value), email in zip(values, emails):
+            if email in existing:
+                errors[index] = dict(email='Email address must be unique')
+            else:
+                existing.add(email)
+                unique.append((index, value))
+
+        # Create the users
+        try:
+            ids = User.bulk_create([value for index, value in unique])
+        except HashingUnavailable:
+            # pyramid_tm aborts on the exception already; doom so the batches
+            # inserted so far can't be committed if the 503 is ever rendered
+            # inside the transaction
+            transaction.doom()
+            raise
+        except Exception as exc:
+            # Prepare the "error" response
+            transaction.doom()
+            logger.error('Failed to bulk create users: %s' % exc)
+            request.response.status = '500 Internal Server Error'
+
+            return dict(data=[None] * len(items),
+                        errors=[dict(_global='Unable to process create')] *
+                               len(items))
+
+        for (index, value), id in zip(unique, ids):
+            data[index] = dict(id=id, email=value['email'].lower())
+
+        if not unique and items:
+            request.response.status = '422 Unprocessable Entity'
+        elif len(unique) == len(items):
+            request.response.status = '201 Created'
+
+        return dict(data=data, errors=errors)
+
     @action(renderer='json', permission='user_permissions')
     def read(self):
         """
         Read a user.
 
+        Responses carry an ``ETag`` header, and requests with a matching
+        ``If-None-Match`` header are answered with a ``304 Not Modified``.
+
         :returns: A JSON object containing:
 
             :data: An object reflecting the requested user.
@@ -214,20 +422,36 @@ class APIUsers(APIView):
         request = self.request
         id = int(request.matchdict['id'])
 
-        # Load the user
-        try:
-            user = User.find(id)
-        except NoResultFound:
+        # Check whether the client's copy is current before loading the user
+        etag = User.etag(id, request.GET.get('fields', ''),
+                         request.GET.get('include', ''))
+
+        if etag is None:
             raise HTTPNotFound
 
-        return dict(data=user)
+        self._conditional(etag)
+
+        def document():
+            # Load the user (along with anything it will be serialized with)
+            user = User.json_query(request).get(id)
+
+            if user is None:
+                raise HTTPNotFound
+
+            return dict(data=user)
+
+        return self._json_document((User.__name__, id, etag), document)
 
     @action(renderer='json', permission='superuser_permissions')
-    @validate(UserUpdateSchema, allow_json=True)
+    @validate(UserUpdateSchema, methods=['POST', 'PUT', 'PATCH'],
+              allow_json=True)
     def update(self):
         """
         Update a user.
 
+        Only the submitted fields are updated, with at most one ``UPDATE``
+        statement per table (the user isn't loaded beforehand).
+
         :returns: A JSON object containing:
 
             :data:    An object reflecting the updated user.
@@ -237,6 +461,7 @@ class APIUsers(APIView):
         Example request::
 
             http -j POST :/api/users/1 email=email@example.com password=secret profile:='{"first_name": "John", "last_name": "Smith"}' Authorization:"Token ..."
+            http -j PATCH :/api/users/1 role=superuser Authorization:"Token ..."
 
         Example response:
 
@@ -266,50 +491,199 @@ class APIUsers(APIView):
 
         user = None
 
-        # Load the user
+        # Drop empty values (they're left as they are)
+        profile = dict((key, value) for key, value in
+                       (params.pop('profile', None) or {}).items() if value)
+        params = dict((key, value) for key, value in params.items() if value)
+
+        if profile:
+            params['profile'] = profile
+
+        if errors or not params:
+            # Check that the user exists (without loading them) to preserve
+            # the 404 for unknown users
+            if not DBSession.query(User.filter(User.id == id).exists()) \
+                            .scalar():
+                raise HTTPNotFound
+            elif not errors:
+                # There doesn't seem to be any data posted
+                raise HTTPBadRequest
+
+            request.response.status = '422 Unprocessable Entity'
+        else:
+            try:
+                # Update the user (and profile) without loading them first
+                found = User.partial_update(id, params)
+                DBSession.flush()
+            except HashingUnavailable:
+                # As in bulk_create, don't let a rendered 503 commit anything
+                transaction.doom()
+                raise
+            except IntegrityError:
+                # Email is the only unique column that can be updated
+                transaction.doom()
+                errors['email'] = 'Email address must be unique'
+                request.response.status = '422 Unprocessable Entity'
+            except Exception as exc:
+                # Prepare the "error" response
+                transaction.doom()
+                errors['_global'] = 'Unable to process update'
+                logger.error('Failed to update user: %s' % exc)
+                request.response.status = '500 Internal Server Error'
+            else:
+                if not found:
+                    raise HTTPNotFound
+
+                # Re-read only what the response needs (overwriting any stale
+                # copy already in the session)
+                user = User.json_query(request) \
+                           .filter(User.id == id) \
+                           .populate_existing() \
+                           .one()
+
+        return dict(data=user, errors=errors)
+
+    @action(renderer='json', permission='superuser_permissions')
+    def bulk_update(self):
+        """
+        Update users in bulk.
+
+        Accepts a JSON object with a list of user ``ids`` and the ``data`` to
+        apply to each of them (validated as it would be by :py:meth:`update`,
+        except that email addresses can't be updated in bulk). The changes
+        are applied with a single ``UPDATE`` statement per table.
+
+        :returns: A JSON object containing:
+
+            :data:   An object containing the ``count`` of updated users.
+            :errors: ``null`` if no error was encountered, otherwise an object
+                     containing the error message(s).
+
+        Example request::
+
+            http -j PATCH :/api/users/bulk ids:='[1, 2, 3]' data:='{"role": "superuser"}' Authorization:"Token ..."
+
+        Example response:
+
+        .. code-block:: json
+
+            {
+                "data": {
+                    "count": 3
+                },
+                "errors": {}
+            }
+        """
+        # Initialize request variables
+        request = self.request
+        errors = {}
+        params = {}
+
+        body = self._body()
+
+        if not isinstance(body, dict):
+            raise HTTPBadRequest
+
+        # Validate the submitted data
+        ids = self._bulk_ids(body.get('ids'))
+
+        if ids is None:
+            errors['ids'] = 'Please provide a list of user ids'
+
         try:
-            user = User.find(id)
-        except NoResultFound:
-            raise HTTPNotFound
+            params = UserUpdateSchema.to_python(body.get('data') or {})
+        except Invalid as err:
+            unpacked = err.unpack_errors()
+            errors.update(unpacked if isinstance(unpacked, dict) else
+                          dict(data=unpacked))
+
+        if 'email' in params:
+            errors['email'] = 'Email address can not be updated in bulk'
+
+        # Drop empty values (as update does)
+        params = dict((key, value) for key, value in params.items() if value)
 
         if errors:
-            user = None
             request.response.status = '422 Unprocessable Entity'
+            return dict(data=None, errors=errors)
         elif not params:
             # There doesn't seem to be any data posted
             raise HTTPBadRequest
-        else:
+
+        try:
+            count = User.bulk_update(ids, params)
+        except HashingUnavailable:
+            # As in bulk_create, don't let a rendered 503 commit anything
+            transaction.doom()
+            raise
+        except Exception as exc:
+            # Prepare the "error" response
+            transaction.doom()
+            errors['_global'] = 'Unable to process update'
+            logger.error('Failed to bulk update users: %s' % exc)
+            request.response.status = '500 Internal Server Error'
+
+            return dict(data=None, errors=errors)
+
+        return dict(data=dict(count=count), errors=errors)
+
+    @action(renderer='json', permission='admin_permissions')
+    def bulk_delete(self):
+        """
+        Delete users in bulk.
+
+        Accepts either a JSON object with a list of user ``ids``, or an
+        ``ids`` query string parameter of comma separated user ids. Users and
+        their profiles are deleted with a single ``DELETE`` statement per
+        table.
+
+        :returns: A JSON object containing:
+
+            :data:   An object containing the ``count`` of deleted users.
+            :errors: ``null`` if no error was encountered, otherwise an object
+                     containing the error message(s).
+
+        Example request::
+
+            http -j DELETE ":/api/users/bulk?ids=1,2,3" Authorization:"Token ..."
+
+        Example response:
+
+        .. code-block:: json
+
+            {
+                "data": {
+                    "count": 3
+                },
+                "errors": {}
+            }
+        """
+        # Initialize request variables
+        request = self.request
+        errors = {}
+
+        if request.GET.get('ids'):
             try:
-                # Pop profile
-                profile = params.pop('profile', {})
+                ids = [int(id) for id in request.GET['ids'].split(',')]
+            except ValueError:
+                ids = None
+        else:
+            body = self._body()
 
-                # Update the user
-                for key, value in params.items():
-                    if value:
-                        setattr(user, key, value)
+            if not isinstance(body, dict):
+                raise HTTPBadRequest
 
-                DBSession.flush()
+            ids = body.get('ids')
 
-                if profile:
-                    # Update the profile
-                    for key, value in profile.items():
-                        if value:
-                            setattr(user.profile, key, value)
+        ids = self._bulk_ids(ids)
 
-                    DBSession.flush()
-            except Exception as exc:
-                # Prepare the "error" response
-                user = None
+        if ids is None:
+            errors['ids'] = 'Please provide a list of user ids'
+            request.response.status = '422 Unprocessable Entity'
 
-                if 'unique' in str(exc).lower():
-                    errors['email'] = 'Email address must be unique'
-                    request.response.status = '422 Unprocessable Entity'
-                else:
-                    errors['_global'] = 'Unable to process update'
-                    logger.error('Failed to update user: %s' % exc)
-                    request.response.status = '500 Internal Server Error'
+            return dict(data=None, errors=errors)
 
-        return dict(data=user, errors=errors)
+        return dict(data=dict(count=User.bulk_delete(ids)), errors=errors)
 
     @action(renderer='json', permission='admin_permissions')
     def delete(self):
@@ -7,6 +7,7 @@ from pyramid_handlers import action
 
 # Project imports
 from . import View
+from ..lib.pagecache import cache_page
 
 
 class Root(View):
@@ -17,11 +18,13 @@ class Root(View):
     """
 
     @action(renderer='index.jinja2')
+    @cache_page()
     def index(self):
         """``/`` or ``/index.html``"""
         return dict()
 
     @action(renderer='about.jinja2')
+    @cache_page()
     def about(self):
         """``/about.html``"""
         return dict()
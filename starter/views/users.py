@@ -23,6 +23,7 @@ from . import View
 from ..lib.validation import (validate, Email, UserLoginForm, UserRegisterForm,
                               UserResetPasswordForm)
 from ..lib.helpers import set_secure_cookie, generate_secret
+from ..lib.pagecache import cache_page
 from ..models import DBSession, User, UserProfile
 
 
@@ -216,6 +217,7 @@ class Users(View):
         return dict(params=params, errors=errors)
 
     @action(renderer='users/me.jinja2', permission='user_permissions')
+    @cache_page(shell=True)
     def me(self):
         """``/users/me.html``"""
         # Initialize request variables